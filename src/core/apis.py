@@ -4,23 +4,43 @@ Gateway Client FastAPI Application
 """
 
 import logging
-from typing import Dict, Any, Optional
+import threading
+import etcd3
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List, Literal, Optional, Tuple, Union
 from pydantic import BaseModel
-from services.discovery import EtcdServiceDiscovery
-from services.http_register import EtcdHttpServiceRegister
+from services._registry_base import DEFAULT_LEASE_TTL
+from services.etcd_client import get_etcd_client, release_etcd_client
+from services.discovery import ContainerService, EtcdServiceDiscovery
+from services.http_register import EtcdHttpServiceRegister, HttpServiceInfo
 from services.ssh_register import EtcdSshServiceRegister
 from utils.port_pool import PortPool
 from proxies.frp import FrpClient
 from proxies.kong import KongProxy
+from utils.retry import retry
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def _http_endpoint_for(http_endpoint: str, service_name: str) -> str:
+    """生成 HTTP 访问端点: {service_name}.{http_endpoint}"""
+    return f"{service_name}.{http_endpoint}"
+
+
+@lru_cache(maxsize=4096)
+def _ssh_endpoint_for(ssh_endpoint: str, ssh_port: int) -> str:
+    """生成 SSH 访问端点: {ssh_endpoint}:{ssh_port}"""
+    return f"{ssh_endpoint}:{ssh_port}"
+
+
+@lru_cache(maxsize=4096)
+def _ssh_proxy_name(service_name: str) -> str:
+    """生成 SSH 服务对应的 FRP 代理名称"""
+    return f"ssh-{service_name}"
+
+
 class ServiceResponse(BaseModel):
     """服务响应模型"""
     success: bool
@@ -28,6 +48,18 @@ class ServiceResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
 
 
+class BatchOperation(BaseModel):
+    """批量操作项"""
+    op: Literal['register', 'unregister']   # 注册或删除
+    proto: Literal['http', 'ssh']           # 服务类型
+    name: str                               # 服务名称
+
+
+class BatchRequest(BaseModel):
+    """批量操作请求模型"""
+    ops: List[BatchOperation]
+
+
 class GatewayClient:
     """网关客户端主类"""
 
@@ -43,7 +75,8 @@ class GatewayClient:
                  frp_port: int = 7400,
                  frp_username: str = 'admin',
                  frp_password: str = '123456',
-                 kong_admin_url: str = 'http://127.0.0.1:8001'):
+                 kong_admin_url: str = 'http://127.0.0.1:8001',
+                 etcd_lease_ttl: int = DEFAULT_LEASE_TTL):
         """
         初始化网关客户端
 
@@ -59,6 +92,7 @@ class GatewayClient:
         :param frp_username: FRP 控制台用户名
         :param frp_password: FRP 控制台密码
         :param kong_admin_url: Kong Admin API 地址
+        :param etcd_lease_ttl: HTTP / SSH 注册信息所绑定 etcd 租约的 TTL（秒）
         """
         self.local_ip = local_ip
         self.etcd_host = etcd_host
@@ -66,6 +100,9 @@ class GatewayClient:
         self.http_endpoint = http_endpoint
         self.ssh_endpoint = ssh_endpoint
 
+        # 服务发现与服务注册在连接时获取进程内共享的 etcd 客户端（同一条 gRPC 连接）
+        self._etcd: Optional[etcd3.Etcd3Client] = None
+
         # 初始化服务发现
         self.discovery = EtcdServiceDiscovery(
             etcd_host=etcd_host,
@@ -78,7 +115,8 @@ class GatewayClient:
             etcd_host=etcd_host,
             etcd_port=etcd_port,
             service_prefix='/gateway-client/services/http/',
-            http_endpoint=http_endpoint
+            http_endpoint=http_endpoint,
+            lease_ttl=etcd_lease_ttl
         )
 
         # 初始化SSH服务注册
@@ -86,7 +124,8 @@ class GatewayClient:
             etcd_host=etcd_host,
             etcd_port=etcd_port,
             service_prefix='/gateway-client/services/ssh/',
-            ssh_endpoint=ssh_endpoint
+            ssh_endpoint=ssh_endpoint,
+            lease_ttl=etcd_lease_ttl
         )
 
         # 初始化端口池
@@ -103,14 +142,45 @@ class GatewayClient:
         # 初始化 Kong 代理
         self.kong_proxy = KongProxy(kong_admin_url=kong_admin_url)
 
-        # 连接状态
+        # 连接状态，并发的首批请求只建立一次连接
         self._connected = False
+        self._connect_lock = threading.Lock()
+
+        # 按服务名分段加锁，同名服务的注册 / 删除串行执行
+        self._name_locks = [threading.Lock() for _ in range(64)]
+
+    @contextmanager
+    def _service_lock(self, *service_names: str):
+        """
+        持有服务名对应的分段锁，多个服务名按固定顺序加锁避免死锁
+
+        :param service_names: 服务名称
+        """
+        stripes = sorted({hash(name) % len(self._name_locks) for name in service_names})
+        for stripe in stripes:
+            self._name_locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._name_locks[stripe].release()
 
     def connect(self) -> bool:
         """连接所有服务"""
         if self._connected:
             return True
 
+        with self._connect_lock:
+            if self._connected:
+                return True
+            return self._connect()
+
+    def _connect(self) -> bool:
+        """连接所有服务，调用方需持有连接锁"""
+        # 合并读取所用的 etcd 客户端
+        if self._etcd is None:
+            self._etcd = get_etcd_client(self.etcd_host, self.etcd_port)
+
         # 连接服务发现
         if not self.discovery.connect():
             logger.error("❌ 无法连接到服务发现")
@@ -132,13 +202,106 @@ class GatewayClient:
 
     def disconnect(self):
         """断开所有服务连接"""
-        if self._connected:
+        with self._connect_lock:
+            if not self._connected:
+                return
             self.discovery.disconnect()
             self.http_register.disconnect()
             self.ssh_register.disconnect()
+            self.frp_client.close()
+            self.kong_proxy.close()
+            release_etcd_client(self.etcd_host, self.etcd_port)
+            self._etcd = None
             self._connected = False
             logger.info("🔌 已断开所有服务连接")
 
+    def _lookup_services(self, service_name: str, register) -> Tuple[Optional[ContainerService], Any]:
+        """
+        查询服务发现信息及已注册的服务信息
+
+        优先读取 watch 缓存，缓存未命中的键通过一次 etcd 事务合并读取
+        服务发现信息可能刚写入、监听事件尚未到达，未命中时总是读取 etcd；
+        注册信息由本进程写入并同步更新缓存，监听正常时未命中即说明未注册
+
+        :param service_name: 服务名称
+        :param register: HTTP 或 SSH 服务注册客户端
+        :return: (服务发现信息, 已注册的服务信息)
+        """
+        # 监听中断时重新加载缓存
+        self.discovery.sync_cache()
+        service = self.discovery.get_cached(service_name)
+        existing_service = register.get_cached(service_name)
+
+        missing = []
+        if service is None:
+            missing.append(self.discovery)
+        if existing_service is None and not register.sync_cache():
+            missing.append(register)
+        if not missing:
+            return service, existing_service
+
+        try:
+            _, responses = self._etcd.transaction(
+                compare=[],
+                success=[self._etcd.transactions.get(source.service_key(service_name)) for source in missing],
+                failure=[]
+            )
+        except Exception as e:
+            logger.warning(f"合并读取服务信息失败，逐个读取 {service_name}: {e}")
+            if service is None:
+                service = self.discovery.get_service(service_name)
+            if existing_service is None:
+                existing_service = register.get_service(service_name)
+            return service, existing_service
+
+        for source, kvs in zip(missing, responses):
+            if not kvs:
+                continue
+            loaded = source.load_service(service_name, kvs[0][0])
+            if source is self.discovery:
+                service = loaded
+            else:
+                existing_service = loaded
+
+        return service, existing_service
+
+    def execute_batch(self, ops: List[BatchOperation]) -> List[ServiceResponse]:
+        """
+        按顺序执行一组注册 / 删除操作，连续的同类注册合并执行：
+        HTTP 注册并发添加 Kong 代理，SSH 注册合并为一次 FRP 部署
+
+        :param ops: 批量操作列表
+        :return: 与操作一一对应的服务响应列表
+        """
+        responses: List[ServiceResponse] = []
+        pending: List[str] = []
+        pending_proto: Optional[str] = None
+
+        def flush():
+            if pending:
+                if pending_proto == 'ssh':
+                    responses.extend(self.register_ssh_services(pending))
+                else:
+                    responses.extend(self.register_http_services(pending))
+                pending.clear()
+
+        for op in ops:
+            if op.op == 'register':
+                if op.proto != pending_proto:
+                    flush()
+                    pending_proto = op.proto
+                pending.append(op.name)
+                continue
+
+            flush()
+            if op.proto == 'http':
+                responses.append(self.unregister_http_service(op.name))
+            else:
+                responses.append(self.unregister_ssh_service(op.name))
+
+        flush()
+        return responses
+
     def register_http_service(self, service_name: str) -> ServiceResponse:
         """
         注册 HTTP 服务
@@ -153,109 +316,226 @@ class GatewayClient:
                     message="无法连接到 etcd 服务"
                 )
 
-        try:
-            # 从服务发现获取服务信息
-            service = self.discovery.get_service(service_name)
-            if not service:
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务 {service_name} 不存在"
-                )
-
-            # 检查 HTTP 服务是否已经注册
-            existing_service = self.http_register.get_service(service_name)
-            if existing_service and existing_service.container_name == service.container_name:
-                logger.info(
-                    f"✅ HTTP 服务已注册: {service_name}:{existing_service.http_port} "
-                    f"-> {existing_service.http_endpoint}"
-                )
+        # 同名服务的注册 / 删除串行执行，避免重复添加 Kong 代理
+        with self._service_lock(service_name):
+            try:
+                result = self._prepare_http_service(service_name)
+                if isinstance(result, ServiceResponse):
+                    return result
+                service, http_port, existing_service = result
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"服务 {service_name} 已注册",
-                    data={
-                        "http_endpoint": existing_service.http_endpoint,
-                        "service_name": existing_service.service_name,
-                        "container_name": existing_service.container_name,
-                        "http_port": existing_service.http_port
-                    }
-                )
+                # 服务已存在，容器名不同，进行更新
+                if existing_service:
+                    return self._update_http_service(service_name, service, http_port, existing_service)
 
-            # 提取端口信息
-            port_map = service.get_service_ports()
+                # 服务不存在，添加 Kong HTTP 代理
+                http_endpoint = _http_endpoint_for(self.http_endpoint, service_name)
+                if not self._add_http_proxy(service_name, http_port, http_endpoint):
+                    return ServiceResponse(
+                        success=False,
+                        message=f"Kong HTTP 代理添加失败"
+                    )
 
-            # 获取 HTTP 端口 (80/tcp)
-            http_port = None
-            for port_key, host_port in port_map.items():
-                if port_key.startswith('80/'):
-                    http_port = int(host_port)
-                    break
+                return self._commit_http_service(service_name, service, http_port, http_endpoint)
 
-            if http_port is None:
+            except Exception as e:
+                logger.error(f"注册 HTTP 服务失败 {service_name}: {e}")
                 return ServiceResponse(
                     success=False,
-                    message=f"服务 {service_name} 没有 HTTP 端口 (80/tcp)"
+                    message=f"注册服务时发生错误: {str(e)}"
                 )
 
-            # 服务已存在，容器名不同，进行更新
-            if existing_service and existing_service.container_name != service.container_name:
-                http_endpoint = existing_service.http_endpoint
-                kong_success = self.kong_proxy.update_http_proxy(service_name, http_port)
-                if not kong_success:
-                    return ServiceResponse(
+    def register_http_services(self, service_names: List[str]) -> List[ServiceResponse]:
+        """
+        批量注册 HTTP 服务，新服务的 Kong 代理并发添加
+
+        :param service_names: 服务名称列表
+        :return: 与服务名称一一对应的服务响应列表
+        """
+        if not self._connected:
+            if not self.connect():
+                return [
+                    ServiceResponse(success=False, message="无法连接到 etcd 服务")
+                    for _ in service_names
+                ]
+
+        # 一次持有本批所有服务名的锁，与同名服务的单个注册 / 删除互斥
+        with self._service_lock(*service_names):
+            responses: Dict[str, ServiceResponse] = {}
+            plans: Dict[str, Tuple[ContainerService, int, str]] = {}
+
+            for service_name in dict.fromkeys(service_names):
+                try:
+                    result = self._prepare_http_service(service_name)
+                    if isinstance(result, ServiceResponse):
+                        responses[service_name] = result
+                        continue
+
+                    service, http_port, existing_service = result
+                    if existing_service:
+                        # 容器名变化的服务逐个更新
+                        responses[service_name] = self._update_http_service(
+                            service_name, service, http_port, existing_service
+                        )
+                    else:
+                        plans[service_name] = (
+                            service, http_port, _http_endpoint_for(self.http_endpoint, service_name)
+                        )
+                except Exception as e:
+                    logger.error(f"注册 HTTP 服务失败 {service_name}: {e}")
+                    responses[service_name] = ServiceResponse(
                         success=False,
-                        message=f"Kong HTTP 代理更新失败"
+                        message=f"注册服务时发生错误: {str(e)}"
                     )
-            else:
-                # 服务不存在，添加 Kong HTTP 代理
-                http_endpoint = f"{service_name}.{self.http_endpoint}"
-                kong_success = self.kong_proxy.add_http_proxy(
-                    name=service_name,
-                    host=self.local_ip,
-                    port=http_port,
-                    domain=http_endpoint
-                )
 
-                if not kong_success:
-                    return ServiceResponse(
-                        success=False,
-                        message=f"Kong HTTP 代理添加失败"
+            if plans:
+                # 并发添加 Kong HTTP 代理，失败的代理按单个流程退避重试
+                results = self.kong_proxy.add_http_proxies([
+                    (service_name, self.local_ip, http_port, http_endpoint)
+                    for service_name, (_, http_port, http_endpoint) in plans.items()
+                ])
+                for service_name, (service, http_port, http_endpoint) in plans.items():
+                    kong_success = (results.get(service_name) or
+                                    self._add_http_proxy(service_name, http_port, http_endpoint))
+                    if not kong_success:
+                        responses[service_name] = ServiceResponse(
+                            success=False,
+                            message=f"Kong HTTP 代理添加失败"
+                        )
+                        continue
+
+                    responses[service_name] = self._commit_http_service(
+                        service_name, service, http_port, http_endpoint
                     )
 
-            # 注册HTTP服务
-            success = self.http_register.register_service(
-                http_endpoint=http_endpoint,
-                service_name=service_name,
-                container_name=service.container_name,
-                http_port=http_port
+            return [responses[service_name] for service_name in service_names]
+
+    def _prepare_http_service(
+        self, service_name: str
+    ) -> Union[ServiceResponse, Tuple[ContainerService, int, Optional[HttpServiceInfo]]]:
+        """
+        准备注册 HTTP 服务：查询服务信息及 HTTP 端口
+
+        :param service_name: 服务名称
+        :return: 无需继续注册时返回服务响应，否则返回 (服务信息, HTTP 端口, 容器名变化前的注册信息)
+        """
+        # 获取服务发现信息及已注册的 HTTP 服务信息
+        service, existing_service = self._lookup_services(service_name, self.http_register)
+        if not service:
+            return ServiceResponse(
+                success=False,
+                message=f"服务 {service_name} 不存在"
             )
 
-            if success:
-                logger.info(f"✅ HTTP 服务注册成功: {service_name}:{http_port} -> {http_endpoint}")
+        # 检查 HTTP 服务是否已经注册
+        if existing_service and existing_service.container_name == service.container_name:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ HTTP 服务已注册: %s:%s -> %s", service_name,
+                            existing_service.http_port, existing_service.http_endpoint)
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"HTTP 服务注册成功",
-                    data={
-                        "http_endpoint": http_endpoint,
-                        "service_name": service_name,
-                        "container_name": service.container_name,
-                        "http_port": http_port
-                    }
-                )
-            else:
-                # 注册失败，清理 Kong 代理
-                self.kong_proxy.delete_http_proxy(service_name)
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务注册失败"
-                )
+            return ServiceResponse(
+                success=True,
+                message=f"服务 {service_name} 已注册",
+                data={
+                    "http_endpoint": existing_service.http_endpoint,
+                    "service_name": existing_service.service_name,
+                    "container_name": existing_service.container_name,
+                    "http_port": existing_service.http_port
+                }
+            )
+
+        # 获取 HTTP 端口 (80/tcp)
+        http_port = service.ports_by_num.get(80)
+
+        if http_port is None:
+            return ServiceResponse(
+                success=False,
+                message=f"服务 {service_name} 没有 HTTP 端口 (80/tcp)"
+            )
+
+        return service, http_port, existing_service
+
+    def _add_http_proxy(self, service_name: str, http_port: int, http_endpoint: str) -> bool:
+        """
+        添加 Kong HTTP 代理
+
+        POST 不由连接池重试，这里整体退避重试；重试前会先查询服务，已创建成功的不会重复创建
+        """
+        return retry(
+            lambda: self.kong_proxy.add_http_proxy(
+                name=service_name,
+                host=self.local_ip,
+                port=http_port,
+                domain=http_endpoint
+            ),
+            key="POST kong http proxy"
+        )
+
+    def _update_http_service(self,
+                             service_name: str,
+                             service: ContainerService,
+                             http_port: int,
+                             existing_service: HttpServiceInfo) -> ServiceResponse:
+        """
+        容器名变化时更新 Kong HTTP 代理并写入 etcd
+
+        :param service_name: 服务名称
+        :param service: 服务发现中的服务信息
+        :param http_port: HTTP 端口
+        :param existing_service: 已注册的 HTTP 服务信息
+        :return: 服务响应
+        """
+        kong_success = self.kong_proxy.update_http_proxy(service_name, http_port)
+        if not kong_success:
+            return ServiceResponse(
+                success=False,
+                message=f"Kong HTTP 代理更新失败"
+            )
+
+        return self._commit_http_service(service_name, service, http_port, existing_service.http_endpoint)
+
+    def _commit_http_service(self,
+                             service_name: str,
+                             service: ContainerService,
+                             http_port: int,
+                             http_endpoint: str) -> ServiceResponse:
+        """
+        Kong 代理就绪后将 HTTP 服务写入 etcd，失败时清理 Kong 代理
+
+        :param service_name: 服务名称
+        :param service: 服务发现中的服务信息
+        :param http_port: HTTP 端口
+        :param http_endpoint: HTTP 访问端点
+        :return: 服务响应
+        """
+        # 注册HTTP服务
+        success = self.http_register.register_service(
+            http_endpoint=http_endpoint,
+            service_name=service_name,
+            container_name=service.container_name,
+            http_port=http_port
+        )
+
+        if success:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ HTTP 服务注册成功: %s:%s -> %s", service_name, http_port, http_endpoint)
 
-        except Exception as e:
-            logger.error(f"注册 HTTP 服务失败 {service_name}: {e}")
+            return ServiceResponse(
+                success=True,
+                message=f"HTTP 服务注册成功",
+                data={
+                    "http_endpoint": http_endpoint,
+                    "service_name": service_name,
+                    "container_name": service.container_name,
+                    "http_port": http_port
+                }
+            )
+        else:
+            # 注册失败，清理 Kong 代理
+            self.kong_proxy.delete_http_proxy(service_name)
             return ServiceResponse(
                 success=False,
-                message=f"注册服务时发生错误: {str(e)}"
+                message=f"服务注册失败"
             )
 
     def unregister_http_service(self, service_name: str) -> ServiceResponse:
@@ -272,47 +552,49 @@ class GatewayClient:
                     message="无法连接到 etcd 服务"
                 )
 
-        try:
-            # 检查HTTP服务是否存在
-            existing_service = self.http_register.get_service(service_name)
-            if not existing_service:
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务 {service_name} 不存在"
-                )
+        # 同名服务的注册 / 删除串行执行
+        with self._service_lock(service_name):
+            try:
+                # 检查HTTP服务是否存在
+                existing_service = self.http_register.get_service(service_name)
+                if not existing_service:
+                    return ServiceResponse(
+                        success=False,
+                        message=f"服务 {service_name} 不存在"
+                    )
 
-            # 从 etcd 删除HTTP服务
-            success = self.http_register.unregister_service(service_name)
+                # 从 etcd 删除HTTP服务
+                success = self.http_register.unregister_service(service_name)
 
-            if success:
-                # 删除对应的 Kong HTTP 代理
-                kong_success = self.kong_proxy.delete_http_proxy(service_name)
+                if success:
+                    # 删除对应的 Kong HTTP 代理
+                    kong_success = self.kong_proxy.delete_http_proxy(service_name)
 
-                if not kong_success:
-                    logger.warning(f"⚠️ Kong HTTP 代理删除失败: {service_name}")
-                else:
-                    logger.info(f"✅ Kong HTTP 代理删除成功: {service_name}")
+                    if not kong_success:
+                        logger.warning(f"⚠️ Kong HTTP 代理删除失败: {service_name}")
+                    else:
+                        logger.info("✅ Kong HTTP 代理删除成功: %s", service_name)
 
-                logger.info(f"✅ HTTP 服务删除成功: {service_name}")
+                    logger.info("✅ HTTP 服务删除成功: %s", service_name)
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"HTTP 服务删除成功",
-                    data={"service_name": service_name}
-                )
-            else:
+                    return ServiceResponse(
+                        success=True,
+                        message=f"HTTP 服务删除成功",
+                        data={"service_name": service_name}
+                    )
+                else:
+                    return ServiceResponse(
+                        success=False,
+                        message=f"服务删除失败"
+                    )
+
+            except Exception as e:
+                logger.error(f"删除 HTTP 服务失败 {service_name}: {e}")
                 return ServiceResponse(
                     success=False,
-                    message=f"服务删除失败"
+                    message=f"删除服务时发生错误: {str(e)}"
                 )
 
-        except Exception as e:
-            logger.error(f"删除 HTTP 服务失败 {service_name}: {e}")
-            return ServiceResponse(
-                success=False,
-                message=f"删除服务时发生错误: {str(e)}"
-            )
-
     def register_ssh_service(self, service_name: str) -> ServiceResponse:
         """
         注册 SSH 服务
@@ -327,111 +609,211 @@ class GatewayClient:
                     message="无法连接到 etcd 服务"
                 )
 
-        try:
-            # 从服务发现获取服务信息
-            service = self.discovery.get_service(service_name)
-            if not service:
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务 {service_name} 不存在"
-                )
-
-            # 检查SSH服务是否已经注册
-            existing_service = self.ssh_register.get_service(service_name)
-            if existing_service and existing_service.container_name == service.container_name:
-                logger.info(
-                    f"✅ SSH 服务已注册: {service_name}:{existing_service.ssh_port} -> "
-                    f"{existing_service.ssh_endpoint}"
-                )
+        # 同名服务的注册 / 删除串行执行，避免重复分配端口
+        with self._service_lock(service_name):
+            try:
+                result = self._prepare_ssh_service(service_name)
+                if isinstance(result, ServiceResponse):
+                    return result
+                service, src_ssh_port = result
+
+                # 从端口池分配目标 SSH 端口
+                try:
+                    dst_ssh_port = self.port_pool.assign(service_name)
+                except RuntimeError as e:
+                    return ServiceResponse(
+                        success=False,
+                        message=f"端口池分配失败: {str(e)}"
+                    )
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"服务 {service_name} 已注册",
-                    data={
-                        "ssh_endpoint": existing_service.ssh_endpoint,
-                        "service_name": service_name,
-                        "container_name": existing_service.container_name
-                    }
+                # 先添加 FRP TCP 代理
+                frp_success = self.frp_client.add_tcp_proxy(
+                    name=_ssh_proxy_name(service_name),
+                    local_ip=self.local_ip,
+                    local_port=src_ssh_port,
+                    remote_port=dst_ssh_port
                 )
 
-            # 提取端口信息
-            port_map = service.get_service_ports()
+                if not frp_success:
+                    # FRP 代理添加失败，释放端口
+                    self.port_pool.release(service_name)
+                    return ServiceResponse(
+                        success=False,
+                        message=f"FRP 代理添加失败"
+                    )
 
-            # 获取 SSH 端口 (22/tcp)
-            src_ssh_port = None
-            for port_key, host_port in port_map.items():
-                if port_key.startswith('22/'):
-                    src_ssh_port = int(host_port)
-                    break
+                return self._commit_ssh_service(service_name, service, src_ssh_port, dst_ssh_port)
 
-            if src_ssh_port is None:
+            except Exception as e:
+                logger.error(f"注册 SSH 服务失败 {service_name}: {e}")
                 return ServiceResponse(
                     success=False,
-                    message=f"服务 {service_name} 没有 SSH 端口 (22/tcp)"
+                    message=f"注册服务时发生错误: {str(e)}"
                 )
 
-            # 从端口池分配目标 SSH 端口
+    def register_ssh_services(self, service_names: List[str]) -> List[ServiceResponse]:
+        """
+        批量注册 SSH 服务，所有 FRP 代理修改合并为一次部署
+
+        :param service_names: 服务名称列表
+        :return: 与服务名称一一对应的服务响应列表
+        """
+        if not self._connected:
+            if not self.connect():
+                return [
+                    ServiceResponse(success=False, message="无法连接到 etcd 服务")
+                    for _ in service_names
+                ]
+
+        # 一次持有本批所有服务名的锁，与同名服务的单个注册 / 删除互斥
+        with self._service_lock(*service_names):
+            responses: Dict[str, ServiceResponse] = {}
+            prepared: Dict[str, Tuple[ContainerService, int]] = {}
+
+            for service_name in dict.fromkeys(service_names):
+                try:
+                    result = self._prepare_ssh_service(service_name)
+                except Exception as e:
+                    logger.error(f"注册 SSH 服务失败 {service_name}: {e}")
+                    result = ServiceResponse(
+                        success=False,
+                        message=f"注册服务时发生错误: {str(e)}"
+                    )
+
+                if isinstance(result, ServiceResponse):
+                    responses[service_name] = result
+                else:
+                    prepared[service_name] = result
+
+            # 一次分配全部目标 SSH 端口，空闲端口不足时整批失败，不占用任何端口
+            plans: Dict[str, Tuple[ContainerService, int, int]] = {}
             try:
-                dst_ssh_port = self.port_pool.assign(service_name)
+                ports = self.port_pool.assign_many(list(prepared))
             except RuntimeError as e:
-                return ServiceResponse(
-                    success=False,
-                    message=f"端口池分配失败: {str(e)}"
-                )
+                for service_name in prepared:
+                    responses[service_name] = ServiceResponse(
+                        success=False,
+                        message=f"端口池分配失败: {str(e)}"
+                    )
+            else:
+                for service_name, (service, src_ssh_port) in prepared.items():
+                    plans[service_name] = (service, src_ssh_port, ports[service_name])
+
+            if plans:
+                try:
+                    # 批量添加 FRP TCP 代理，只部署一次
+                    with self.frp_client.batch():
+                        for service_name, (_, src_ssh_port, dst_ssh_port) in plans.items():
+                            self.frp_client.add_tcp_proxy(
+                                name=_ssh_proxy_name(service_name),
+                                local_ip=self.local_ip,
+                                local_port=src_ssh_port,
+                                remote_port=dst_ssh_port
+                            )
+                except Exception as e:
+                    logger.error(f"批量添加 FRP 代理失败: {e}")
+                    self.port_pool.release_many(plans)
+                    for service_name in plans:
+                        responses[service_name] = ServiceResponse(
+                            success=False,
+                            message=f"FRP 代理添加失败"
+                        )
+                else:
+                    for service_name, (service, src_ssh_port, dst_ssh_port) in plans.items():
+                        responses[service_name] = self._commit_ssh_service(
+                            service_name, service, src_ssh_port, dst_ssh_port
+                        )
+
+            return [responses[service_name] for service_name in service_names]
 
-            # 先添加 FRP TCP 代理
-            frp_proxy_name = f"ssh-{service_name}"
-            frp_success = self.frp_client.add_tcp_proxy(
-                name=frp_proxy_name,
-                local_ip=self.local_ip,
-                local_port=src_ssh_port,
-                remote_port=dst_ssh_port
+    def _prepare_ssh_service(
+        self, service_name: str
+    ) -> Union[ServiceResponse, Tuple[ContainerService, int]]:
+        """
+        准备注册 SSH 服务：查询服务信息及源 SSH 端口，目标端口由调用方分配
+
+        :param service_name: 服务名称
+        :return: 无需继续注册时返回服务响应，否则返回 (服务信息, 源 SSH 端口)
+        """
+        # 获取服务发现信息及已注册的 SSH 服务信息
+        service, existing_service = self._lookup_services(service_name, self.ssh_register)
+        if not service:
+            return ServiceResponse(
+                success=False,
+                message=f"服务 {service_name} 不存在"
             )
 
-            if not frp_success:
-                # FRP 代理添加失败，释放端口
-                self.port_pool.release(service_name)
-                return ServiceResponse(
-                    success=False,
-                    message=f"FRP 代理添加失败"
-                )
+        # 检查SSH服务是否已经注册
+        if existing_service and existing_service.container_name == service.container_name:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ SSH 服务已注册: %s:%s -> %s", service_name,
+                            existing_service.ssh_port, existing_service.ssh_endpoint)
 
-            # 注册SSH服务
-            success = self.ssh_register.register_service(
-                service_name=service_name,
-                container_name=service.container_name,
-                src_ssh_port=src_ssh_port,
-                dst_ssh_port=dst_ssh_port
+            return ServiceResponse(
+                success=True,
+                message=f"服务 {service_name} 已注册",
+                data={
+                    "ssh_endpoint": existing_service.ssh_endpoint,
+                    "service_name": service_name,
+                    "container_name": existing_service.container_name
+                }
             )
 
-            if success:
-                ssh_endpoint = f"{self.ssh_endpoint}:{dst_ssh_port}"
-                logger.info(f"✅ SSH 服务注册成功: {service_name}:{src_ssh_port} -> {ssh_endpoint}")
+        # 获取 SSH 端口 (22/tcp)
+        src_ssh_port = service.ports_by_num.get(22)
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"SSH 服务注册成功",
-                    data={
-                        "ssh_endpoint": ssh_endpoint,
-                        "service_name": service_name,
-                        "container_name": service.container_name,
-                        "ssh_port": dst_ssh_port
-                    }
-                )
-            else:
-                # 注册失败，清理 FRP 代理和释放端口
-                self.frp_client.remove_proxy(frp_proxy_name)
-                self.port_pool.release(service_name)
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务注册失败"
-                )
+        if src_ssh_port is None:
+            return ServiceResponse(
+                success=False,
+                message=f"服务 {service_name} 没有 SSH 端口 (22/tcp)"
+            )
 
-        except Exception as e:
-            logger.error(f"注册 SSH 服务失败 {service_name}: {e}")
+        return service, src_ssh_port
+
+    def _commit_ssh_service(self,
+                            service_name: str,
+                            service: ContainerService,
+                            src_ssh_port: int,
+                            dst_ssh_port: int) -> ServiceResponse:
+        """
+        FRP 代理就绪后将 SSH 服务写入 etcd，失败时清理 FRP 代理并释放端口
+
+        :param service_name: 服务名称
+        :param service: 服务发现中的服务信息
+        :param src_ssh_port: 源 SSH 端口
+        :param dst_ssh_port: 目标 SSH 端口
+        :return: 服务响应
+        """
+        # 注册SSH服务
+        success = self.ssh_register.register_service(
+            service_name=service_name,
+            container_name=service.container_name,
+            src_ssh_port=src_ssh_port,
+            dst_ssh_port=dst_ssh_port
+        )
+
+        if success:
+            ssh_endpoint = _ssh_endpoint_for(self.ssh_endpoint, dst_ssh_port)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ SSH 服务注册成功: %s:%s -> %s", service_name, src_ssh_port, ssh_endpoint)
+
+            return ServiceResponse(
+                success=True,
+                message=f"SSH 服务注册成功",
+                data={
+                    "ssh_endpoint": ssh_endpoint,
+                    "service_name": service_name,
+                    "container_name": service.container_name,
+                    "ssh_port": dst_ssh_port
+                }
+            )
+        else:
+            # 注册失败，清理 FRP 代理和释放端口
+            self.frp_client.remove_proxy(_ssh_proxy_name(service_name))
+            self.port_pool.release(service_name)
             return ServiceResponse(
                 success=False,
-                message=f"注册服务时发生错误: {str(e)}"
+                message=f"服务注册失败"
             )
 
     def unregister_ssh_service(self, service_name: str) -> ServiceResponse:
@@ -448,46 +830,48 @@ class GatewayClient:
                     message="无法连接到 etcd 服务"
                 )
 
-        try:
-            # 检查SSH服务是否存在
-            existing_service = self.ssh_register.get_service(service_name)
-            if not existing_service:
-                return ServiceResponse(
-                    success=False,
-                    message=f"服务 {service_name} 不存在"
-                )
+        # 同名服务的注册 / 删除串行执行
+        with self._service_lock(service_name):
+            try:
+                # 检查SSH服务是否存在
+                existing_service = self.ssh_register.get_service(service_name)
+                if not existing_service:
+                    return ServiceResponse(
+                        success=False,
+                        message=f"服务 {service_name} 不存在"
+                    )
 
-            # 从 etcd 删除SSH服务
-            success = self.ssh_register.unregister_service(service_name)
+                # 从 etcd 删除SSH服务
+                success = self.ssh_register.unregister_service(service_name)
 
-            if success:
-                # 删除对应的 FRP 代理
-                frp_proxy_name = f"ssh-{service_name}"
-                frp_success = self.frp_client.remove_proxy(frp_proxy_name)
+                if success:
+                    # 删除对应的 FRP 代理
+                    frp_proxy_name = _ssh_proxy_name(service_name)
+                    frp_success = self.frp_client.remove_proxy(frp_proxy_name)
 
-                if not frp_success:
-                    logger.warning(f"⚠️ FRP 代理删除失败: {frp_proxy_name}")
-                else:
-                    logger.info(f"✅ FRP 代理删除成功: {frp_proxy_name}")
+                    if not frp_success:
+                        logger.warning(f"⚠️ FRP 代理删除失败: {frp_proxy_name}")
+                    else:
+                        logger.info("✅ FRP 代理删除成功: %s", frp_proxy_name)
 
-                # 释放端口
-                self.port_pool.release(service_name)
-                logger.info(f"✅ SSH 服务删除成功: {service_name}")
+                    # 释放端口
+                    self.port_pool.release(service_name)
+                    logger.info("✅ SSH 服务删除成功: %s", service_name)
 
-                return ServiceResponse(
-                    success=True,
-                    message=f"SSH 服务删除成功",
-                    data={"service_name": service_name}
-                )
-            else:
+                    return ServiceResponse(
+                        success=True,
+                        message=f"SSH 服务删除成功",
+                        data={"service_name": service_name}
+                    )
+                else:
+                    return ServiceResponse(
+                        success=False,
+                        message=f"服务删除失败"
+                    )
+
+            except Exception as e:
+                logger.error(f"删除 SSH 服务失败 {service_name}: {e}")
                 return ServiceResponse(
                     success=False,
-                    message=f"服务删除失败"
+                    message=f"删除服务时发生错误: {str(e)}"
                 )
-
-        except Exception as e:
-            logger.error(f"删除 SSH 服务失败 {service_name}: {e}")
-            return ServiceResponse(
-                success=False,
-                message=f"删除服务时发生错误: {str(e)}"
-            )
@@ -1,39 +1,70 @@
 from fastapi import FastAPI, Path
 from fastapi.middleware.cors import CORSMiddleware
-from core.apis import GatewayClient, ServiceResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from core.apis import BatchRequest, GatewayClient, ServiceResponse
+from logging_setup import configure_logging
+import asyncio
 import logging
 import os
+from typing import List, Optional
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
-# 创建全局的网关客户端实例
-gateway_client = GatewayClient(
-    local_ip=os.getenv('LOCAL_IP', '127.0.0.1'),
-    etcd_host=os.getenv('ETCD_HOST', 'localhost'),
-    etcd_port=int(os.getenv('ETCD_PORT', '2379')),
-    ssh_port_start=int(os.getenv('SSH_PORT_START', '40000')),
-    ssh_port_end=int(os.getenv('SSH_PORT_END', '40099')),
-    http_endpoint=os.getenv('HTTP_ENDPOINT', 'example.com'),
-    ssh_endpoint=os.getenv('SSH_ENDPOINT', 'connect.example.com'),
-    frp_host=os.getenv('FRP_HOST', 'localhost'),
-    frp_port=int(os.getenv('FRP_PORT', '7400')),
-    frp_username=os.getenv('FRP_USERNAME', 'admin'),
-    frp_password=os.getenv('FRP_PASSWORD', '123456'),
-    kong_admin_url=os.getenv('KONG_ADMIN_URL', 'http://127.0.0.1:8001')
-)
+# 网关客户端实例（按进程延迟创建，确保 gunicorn 每个 worker 持有独立的连接）
+_gateway_client: Optional[GatewayClient] = None
+
+
+def get_gateway() -> GatewayClient:
+    """获取当前进程的网关客户端实例，首次调用时创建"""
+    global _gateway_client
+    if _gateway_client is None:
+        _gateway_client = GatewayClient(
+            local_ip=os.getenv('LOCAL_IP', '127.0.0.1'),
+            etcd_host=os.getenv('ETCD_HOST', 'localhost'),
+            etcd_port=int(os.getenv('ETCD_PORT', '2379')),
+            ssh_port_start=int(os.getenv('SSH_PORT_START', '40000')),
+            ssh_port_end=int(os.getenv('SSH_PORT_END', '40099')),
+            http_endpoint=os.getenv('HTTP_ENDPOINT', 'example.com'),
+            ssh_endpoint=os.getenv('SSH_ENDPOINT', 'connect.example.com'),
+            frp_host=os.getenv('FRP_HOST', 'localhost'),
+            frp_port=int(os.getenv('FRP_PORT', '7400')),
+            frp_username=os.getenv('FRP_USERNAME', 'admin'),
+            frp_password=os.getenv('FRP_PASSWORD', '123456'),
+            kong_admin_url=os.getenv('KONG_ADMIN_URL', 'http://127.0.0.1:8001'),
+            etcd_lease_ttl=int(os.getenv('ETCD_LEASE_TTL', '86400'))
+        )
+    return _gateway_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时连接服务，关闭时断开连接并释放 etcd / Kong / FRP 连接池"""
+    configure_logging()
+    logger.info("🚀 启动网关客户端 API 服务...")
+
+    # 网关客户端的 etcd / Kong / FRP 调用均为阻塞 I/O，放到有界线程池中执行，避免阻塞事件循环
+    max_workers = int(os.getenv('THREAD_POOL_SIZE', '32'))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+
+    if not await asyncio.to_thread(get_gateway().connect):
+        logger.error("❌ 服务连接失败")
+    else:
+        logger.info("✅ 网关客户端 API 服务已启动")
+
+    yield
+
+    logger.info("👋 关闭网关客户端 API 服务...")
+    await asyncio.to_thread(get_gateway().disconnect)
 
 
 # 创建 FastAPI 应用
 app = FastAPI(
     title="Gateway Client API",
     description="网关客户端 API 服务",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -47,23 +78,6 @@ if os.getenv("ENABLE_CORS", "0") == "1":
     )
 
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时连接服务"""
-    logger.info("🚀 启动网关客户端 API 服务...")
-    if not gateway_client.connect():
-        logger.error("❌ 服务连接失败")
-    else:
-        logger.info("✅ 网关客户端 API 服务已启动")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """应用关闭时断开连接"""
-    logger.info("👋 关闭网关客户端 API 服务...")
-    gateway_client.disconnect()
-
-
 @app.get("/api/v1/gateway/http/{service_name}")
 async def register_http_service(
     service_name: str = Path(..., description="服务名称")
@@ -71,8 +85,8 @@ async def register_http_service(
     """
     注册 HTTP 服务并返回 HTTP 访问地址
     """
-    logger.info(f"📝 请求注册 HTTP 服务: {service_name}")
-    return gateway_client.register_http_service(service_name)
+    logger.info("📝 请求注册 HTTP 服务: %s", service_name)
+    return await asyncio.to_thread(get_gateway().register_http_service, service_name)
 
 
 @app.delete("/api/v1/gateway/http/{service_name}")
@@ -82,8 +96,8 @@ async def unregister_http_service(
     """
     删除 HTTP 服务
     """
-    logger.info(f"🗑️ 请求删除 HTTP 服务: {service_name}")
-    return gateway_client.unregister_http_service(service_name)
+    logger.info("🗑️ 请求删除 HTTP 服务: %s", service_name)
+    return await asyncio.to_thread(get_gateway().unregister_http_service, service_name)
 
 
 @app.get("/api/v1/gateway/ssh/{service_name}")
@@ -93,8 +107,8 @@ async def register_ssh_service(
     """
     注册 SSH 服务并返回 SSH 访问地址
     """
-    logger.info(f"📝 请求注册 SSH 服务: {service_name}")
-    return gateway_client.register_ssh_service(service_name)
+    logger.info("📝 请求注册 SSH 服务: %s", service_name)
+    return await asyncio.to_thread(get_gateway().register_ssh_service, service_name)
 
 
 @app.delete("/api/v1/gateway/ssh/{service_name}")
@@ -104,8 +118,17 @@ async def unregister_ssh_service(
     """
     删除 SSH 服务
     """
-    logger.info(f"🗑️ 请求删除 SSH 服务: {service_name}")
-    return gateway_client.unregister_ssh_service(service_name)
+    logger.info("🗑️ 请求删除 SSH 服务: %s", service_name)
+    return await asyncio.to_thread(get_gateway().unregister_ssh_service, service_name)
+
+
+@app.post("/api/v1/gateway/batch")
+async def execute_batch(request: BatchRequest) -> List[ServiceResponse]:
+    """
+    批量注册 / 删除 HTTP 与 SSH 服务，按请求顺序返回结果
+    """
+    logger.info("📦 请求批量操作: %d 项", len(request.ops))
+    return await asyncio.to_thread(get_gateway().execute_batch, request.ops)
 
 
 @app.get("/health")
@@ -124,6 +147,7 @@ async def root():
             "GET /api/v1/gateway/http/{service-name} - 注册HTTP服务",
             "DELETE /api/v1/gateway/http/{service-name} - 删除HTTP服务",
             "GET /api/v1/gateway/ssh/{service-name} - 注册SSH服务",
-            "DELETE /api/v1/gateway/ssh/{service-name} - 删除SSH服务"
+            "DELETE /api/v1/gateway/ssh/{service-name} - 删除SSH服务",
+            "POST /api/v1/gateway/batch - 批量注册/删除服务"
         ]
     }
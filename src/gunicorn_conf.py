@@ -0,0 +1,31 @@
+"""
+Gateway Client gunicorn 配置
+使用 gunicorn 管理多个 Uvicorn worker 进程
+
+启动方式: gunicorn -c src/gunicorn_conf.py core.routers:app
+"""
+
+import os
+
+# 监听地址
+bind = "0.0.0.0:2381"
+
+# worker 配置
+# 注意：SSH 端口池与 FRP 代理表保存在进程内存中，多个 worker 之间不共享，
+# 因此默认只启动 1 个 worker；仅在确认部署方式允许时再通过 WORKERS 调大
+workers = int(os.getenv('WORKERS', '1'))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 不预加载应用，每个 worker 在启动后各自创建网关客户端，避免 fork 前后共享 socket
+preload_app = False
+
+# 超时配置
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# 日志配置
+# 访问日志默认关闭，与 start_api.py 一致，设置 ACCESS_LOG=1 时输出到标准输出
+loglevel = "info"
+accesslog = "-" if os.getenv('ACCESS_LOG', '0') == '1' else None
+errorlog = "-"
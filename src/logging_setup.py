@@ -0,0 +1,26 @@
+"""
+Gateway Client 日志配置
+在进程启动时统一配置一次根日志记录器
+"""
+
+import logging
+import os
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(level: str = None):
+    """
+    配置根日志记录器，重复调用时替换已有的处理器，避免重复输出
+
+    :param level: 日志级别，默认读取环境变量 LOG_LEVEL（默认 INFO）
+    """
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
@@ -1,16 +1,23 @@
 import base64
+import re
+import threading
+import time
 import requests
 import logging
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Optional
 from dataclasses import dataclass
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# 匹配行首的第一个 [[proxies]] 段落
+_PROXY_RE = re.compile(r'(?m)^[ \t]*\[\[proxies\]\]')
+
+# 请求超时（连接, 读取），与连接池的有限次重试共同限制一次部署的最长耗时
+_TIMEOUT = (3, 10)
+
 
 @dataclass
 class FrpProxy:
@@ -23,13 +30,14 @@ class FrpProxy:
 
     def to_config_section(self) -> str:
         """转换为 FRP 配置段"""
-        config = f"\n[[proxies]]\n"
-        config += f"name = \"{self.name}\"\n"
-        config += f"type = \"{self.type}\"\n"
-        config += f"localIP = \"{self.local_ip}\"\n"
-        config += f"localPort = {self.local_port}\n"
-        config += f"remotePort = {self.remote_port}\n"
-        return config
+        return (
+            f'\n[[proxies]]\n'
+            f'name = "{self.name}"\n'
+            f'type = "{self.type}"\n'
+            f'localIP = "{self.local_ip}"\n'
+            f'localPort = {self.local_port}\n'
+            f'remotePort = {self.remote_port}\n'
+        )
 
 
 class FrpClient:
@@ -39,7 +47,8 @@ class FrpClient:
                  frp_host: str = "localhost",
                  frp_port: int = 7400,
                  username: str = "admin",
-                 password: str = "123456"):
+                 password: str = "123456",
+                 base_config_ttl: float = 60):
         """
         初始化 FRP 客户端
 
@@ -47,6 +56,7 @@ class FrpClient:
         :param frp_port: FRP 客户端 Web 控制台端口
         :param username: 控制台用户名
         :param password: 控制台密码
+        :param base_config_ttl: 基础配置（[[proxies]] 之前的部分）缓存时间，单位秒
         """
         self.frp_host = frp_host
         self.frp_port = frp_port
@@ -57,9 +67,43 @@ class FrpClient:
         self.base_url = f"http://{frp_host}:{frp_port}/api"
         self.auth_header = self._create_auth_header()
 
+        # 复用同一个 Session，保持与 FRP 控制台的长连接
+        # 连接异常和 5xx 由连接池退避重试，4xx（认证失败、配置被拒绝）直接返回
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=8,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504],
+                allowed_methods=["GET", "PUT"],
+                raise_on_status=False
+            )
+        ))
+        self._session.headers["Authorization"] = self.auth_header
+
         # 存储当前代理配置
         self.proxies: Dict[str, FrpProxy] = {}
 
+        # 基础配置缓存，避免每次部署都重新获取
+        self.base_config_ttl = base_config_ttl
+        self._base_config: Optional[str] = None
+        self._base_config_ts = 0.0
+
+        # 保护内存中的代理表，部署时只在锁内快照配置，网络请求在锁外进行
+        self._lock = threading.RLock()
+
+        # 串行化对 FRP 控制台的部署，避免旧配置覆盖新配置
+        self._deploy_lock = threading.Lock()
+
+        # 代理表版本号，已部署的版本不低于本次修改时无需再次部署
+        self._version = 0
+        self._deployed_version = 0
+
+        # 批量模式下延迟部署，退出批量时统一部署一次
+        self._deferred = False
+
     def _create_auth_header(self) -> str:
         """创建 Basic Auth 认证头"""
         credentials = f"{self.username}:{self.password}"
@@ -68,48 +112,36 @@ class FrpClient:
 
     def _remove_proxy_sections(self, config: str) -> str:
         """截取第一个 [[proxies]] 之前的所有信息"""
-        lines = config.split('\n')
-        result_lines = []
-
-        for line in lines:
-            stripped_line = line.strip()
-
-            # 检测到第一个 [[proxies]] 段落就停止
-            if stripped_line.startswith('[[proxies]]'):
-                break
-
-            # 保留这一行
-            result_lines.append(line)
+        m = _PROXY_RE.search(config)
+        head = config[:m.start()] if m else config
 
         # 确保配置以换行符结尾
-        config_without_proxies = '\n'.join(result_lines).rstrip()
-        if config_without_proxies and not config_without_proxies.endswith('\n'):
-            config_without_proxies += '\n'
+        head = head.rstrip()
+        if head:
+            head += '\n'
 
-        return config_without_proxies
+        return head
 
     def _make_request(self, method: str, endpoint: str, data: str = None) -> requests.Response:
         """发送 HTTP 请求"""
         url = f"{self.base_url}{endpoint}"
-        headers = {
-            'Authorization': self.auth_header
-        }
 
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, timeout=10)
-            elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, data=data, timeout=10)
-            else:
+            if method.upper() not in ('GET', 'PUT'):
                 raise ValueError(f"不支持的 HTTP 方法: {method}")
 
-            logger.debug(f"{method} {url} -> {response.status_code}")
+            response = self._session.request(method, url, data=data, timeout=_TIMEOUT)
+            logger.debug("%s %s -> %s", method, url, response.status_code)
             return response
 
         except requests.RequestException as e:
             logger.error(f"请求失败 {method} {url}: {e}")
             raise
 
+    def close(self):
+        """关闭与 FRP 控制台的连接"""
+        self._session.close()
+
     def get_config(self) -> Optional[str]:
         """获取当前 FRP 配置"""
         try:
@@ -151,36 +183,130 @@ class FrpClient:
             logger.error(f"重载配置异常: {e}")
             return False
 
+    def _put_and_reload(self, config: str) -> bool:
+        """
+        更新 FRP 配置并立即重载
+
+        frpc 控制台没有合并的更新并重载接口，两个请求复用同一个 Session 连接顺序发送
+        """
+        response = self._session.put(f"{self.base_url}/config", data=config, timeout=_TIMEOUT)
+        if response.status_code != 200:
+            logger.error(f"更新配置失败: {response.status_code} - {response.text}")
+            return False
+
+        response = self._session.get(f"{self.base_url}/reload", timeout=_TIMEOUT)
+        if response.status_code != 200:
+            logger.error(f"重载配置失败: {response.status_code} - {response.text}")
+            return False
+
+        return True
+
+    def _get_base_config(self) -> Optional[str]:
+        """获取基础配置，缓存未过期时直接返回缓存"""
+        if (self._base_config is not None and
+                time.monotonic() - self._base_config_ts < self.base_config_ttl):
+            return self._base_config
+
+        current_config = self.get_config()
+        if current_config is None:
+            return None
+
+        # 移除现有的 [[proxies]] 段落，保留基础配置
+        self._base_config = self._remove_proxy_sections(current_config)
+        self._base_config_ts = time.monotonic()
+        return self._base_config
+
+    def invalidate_base_config(self):
+        """使基础配置缓存失效，下次部署时重新获取"""
+        self._base_config = None
+
     def deploy_proxies(self) -> bool:
         """部署代理配置（更新配置并重载）"""
-        try:
-            # 1. 获取当前配置作为基础
-            current_config = self.get_config()
-            if current_config is None:
-                logger.error("无法获取当前配置")
-                return False
+        with self._lock:
+            self._version += 1
+            version = self._version
+        return self._deploy_proxies(version)
 
-            # 2. 移除现有的 [[proxies]] 段落，保留基础配置
-            base_config = self._remove_proxy_sections(current_config)
+    def _deploy_proxies(self, version: int) -> bool:
+        """
+        部署不低于指定版本的代理配置，调用方不能持有代理表锁
 
-            # 3. 添加所有代理配置
-            for proxy in self.proxies.values():
-                base_config += proxy.to_config_section()
+        等待部署锁期间其他线程已部署了包含本次修改的配置时直接返回
 
-            # 4. 更新配置
-            if not self.put_config(base_config):
-                return False
+        :param version: 需要部署的代理表版本
+        :return: 是否成功
+        """
+        with self._deploy_lock:
+            if self._deployed_version >= version:
+                return True
+
+            # 快照当前代理表，等待期间其他线程的修改一并部署
+            with self._lock:
+                version = self._version
+                sections = [proxy.to_config_section() for proxy in self.proxies.values()]
+
+            try:
+                # 1. 获取基础配置（已移除 [[proxies]] 段落）
+                base_config = self._get_base_config()
+                if base_config is None:
+                    logger.error("无法获取当前配置")
+                    return False
 
-            # 5. 重载配置
-            if not self.reload_config():
+                # 2. 添加所有代理配置
+                new_config = "".join([base_config, *sections])
+
+                # 3. 更新并重载配置（连接异常和 5xx 由连接池重试）
+                if not self._put_and_reload(new_config):
+                    self.invalidate_base_config()
+                    return False
+
+                self._deployed_version = version
+                logger.debug("✅ FRP 代理配置部署成功")
+                return True
+
+            except Exception as e:
+                logger.error(f"部署代理配置失败: {e}")
+                self.invalidate_base_config()
                 return False
 
-            logger.debug("✅ FRP 代理配置部署成功")
-            return True
+    @contextmanager
+    def batch(self):
+        """
+        批量修改代理，期间的添加/移除只修改内存中的配置，退出时统一部署一次
 
-        except Exception as e:
-            logger.error(f"部署代理配置失败: {e}")
-            return False
+        部署失败时回滚本次批量中的所有修改并抛出 RuntimeError
+        批量修改期间持有代理表锁，部署在释放锁之后进行
+        """
+        with self._lock:
+            if self._deferred:
+                # 嵌套批量，由最外层统一部署
+                yield
+                return
+
+            snapshot = dict(self.proxies)
+            self._deferred = True
+            try:
+                yield
+            except Exception:
+                self.proxies = snapshot
+                raise
+            finally:
+                self._deferred = False
+
+            version = self._version
+            changed = [name for name in snapshot.keys() | self.proxies.keys()
+                       if snapshot.get(name) != self.proxies.get(name)]
+
+        if not self._deploy_proxies(version):
+            # 只回滚本次批量修改过的代理，保留其他线程在部署期间的修改
+            with self._lock:
+                for name in changed:
+                    if name in snapshot:
+                        self.proxies[name] = snapshot[name]
+                    else:
+                        self.proxies.pop(name, None)
+                self._version += 1
+            raise RuntimeError("FRP 代理批量部署失败")
 
     def add_tcp_proxy(self, name: str, local_ip: str, local_port: int, remote_port: int) -> bool:
         """
@@ -200,9 +326,15 @@ class FrpClient:
             remote_port=remote_port
         )
 
-        self.proxies[name] = proxy
-        logger.info(f"添加 TCP 代理: {name} ({local_ip}:{local_port} -> :{remote_port})")
-        return self.deploy_proxies()
+        with self._lock:
+            self.proxies[name] = proxy
+            self._version += 1
+            version = self._version
+            logger.info(f"添加 TCP 代理: {name} ({local_ip}:{local_port} -> :{remote_port})")
+            if self._deferred:
+                return True
+
+        return self._deploy_proxies(version)
 
     def remove_proxy(self, name: str) -> bool:
         """
@@ -211,17 +343,24 @@ class FrpClient:
         :param name: 代理名称
         :return: 是否成功
         """
-        if name in self.proxies:
+        with self._lock:
+            if name not in self.proxies:
+                logger.warning(f"代理不存在: {name}")
+                return False
+
             self.proxies.pop(name)
+            self._version += 1
+            version = self._version
             logger.info(f"移除代理: {name}")
-            return self.deploy_proxies()
-        else:
-            logger.warning(f"代理不存在: {name}")
-            return False
+            if self._deferred:
+                return True
+
+        return self._deploy_proxies(version)
 
     def list_proxies(self) -> Dict[str, FrpProxy]:
         """列出所有代理"""
-        return self.proxies.copy()
+        with self._lock:
+            return self.proxies.copy()
 
     def print_proxies(self):
         """打印当前所有代理"""
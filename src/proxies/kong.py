@@ -1,9 +1,13 @@
+import orjson
 import requests
 import logging
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, List, Tuple
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +22,66 @@ class KongProxy:
             kong_admin_url: Kong Admin API 的基础 URL
         """
         self.kong_admin_url = kong_admin_url.rstrip('/')
+        self.services_url = f"{self.kong_admin_url}/services"
+        self.routes_url = f"{self.kong_admin_url}/routes"
+
+        # 连接池按并发注册规模调大，网络异常和 502/503/504 由连接池退避重试
+        # POST 创建不是幂等操作，自动重试可能对已成功的创建返回 409，因此不重试 POST
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=64,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.1,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=["GET", "PATCH", "DELETE"],
+                raise_on_status=False
+            )
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+        # 请求体统一使用 JSON，数组字段无需表单编码
+        self.session.headers["Content-Type"] = "application/json"
+
+        # 服务与路由信息的短时缓存，合并短时间内对同一名称的重复查询
+        self._svc_cache: TTLCache = TTLCache(maxsize=1024, ttl=5)
+        self._route_cache: TTLCache = TTLCache(maxsize=1024, ttl=5)
+        self._cache_lock = threading.RLock()
+
+        # 后台预热连接，首次注册时无需再等待 TCP 握手
+        threading.Thread(target=self._warmup, name="kong-warmup", daemon=True).start()
+
+    def _warmup(self):
+        """请求 /status 建立到 Kong Admin API 的 keep-alive 连接"""
+        try:
+            self._request('GET', f"{self.kong_admin_url}/status", timeout=2)
+        except requests.RequestException as e:
+            logger.debug("Kong Admin API 连接预热失败: %s", e)
+
+    @staticmethod
+    def _svc_name(name: str) -> str:
+        """Kong 中服务和路由的名称"""
+        return "http-" + name
+
+    def _invalidate_service(self, name: str):
+        """服务变更后使缓存失效"""
+        with self._cache_lock:
+            self._svc_cache.pop(name, None)
+
+    def _invalidate_route(self, name: str):
+        """路由变更后使缓存失效"""
+        with self._cache_lock:
+            self._route_cache.pop(name, None)
+
+    def close(self):
+        """关闭与 Kong Admin API 的连接"""
+        self.session.close()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求到 Kong Admin API（重试由连接池的 Retry 策略处理）"""
+        return self.session.request(method, url, **kwargs)
 
     def add_http_proxy(self, name: str, host: str, port: int, domain: str, protocol: str = "http") -> bool:
         """
@@ -38,10 +101,10 @@ class KongProxy:
             # 第一步：获取服务信息
             service_info = self._get_service(name)
             if service_info:
-                logger.debug(f"服务 {name} 已存在，检查服务信息是否一致")
+                logger.debug("服务 %s 已存在，检查服务信息是否一致", name)
                 if (service_info['protocol'] == protocol and
                     service_info['host'] == host and
-                    service_info['port'] == str(port)):
+                    service_info['port'] == port):
                     logger.info(f"HTTP 代理已存在: {name} -> {host}:{port} (域名: {domain})")
                     return True
                 else:
@@ -74,6 +137,61 @@ class KongProxy:
             logger.error(f"添加 HTTP 代理时发生异常: {e}")
             return False
 
+    def add_http_proxies(self, specs: List[Tuple[str, str, int, str]],
+                         protocol: str = "http", max_workers: int = 16) -> Dict[str, bool]:
+        """
+        批量添加 HTTP 代理，并发提交服务和路由的创建请求
+
+        Args:
+            specs: 代理列表，每项为 (name, host, port, domain)
+            protocol: 协议类型，默认为 http
+            max_workers: 并发请求数
+
+        Returns:
+            Dict[str, bool]: 每个代理名称对应的操作结果
+        """
+        results: Dict[str, bool] = {}
+        if not specs:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(specs))) as executor:
+            # 第一步：并发添加服务
+            service_futures = {
+                spec: executor.submit(self._add_service, spec[0], protocol, spec[1], spec[2])
+                for spec in specs
+            }
+            added, fallback = [], []
+            for spec, future in service_futures.items():
+                (added if future.result() else fallback).append(spec)
+
+            # 添加失败的服务可能已存在，按单个代理的流程检查并更新
+            fallback_futures = {
+                spec[0]: executor.submit(self.add_http_proxy, *spec, protocol)
+                for spec in fallback
+            }
+
+            # 第二步：为新添加的服务并发添加路由
+            route_futures = {
+                spec[0]: executor.submit(self._add_route, spec[0], spec[3])
+                for spec in added
+            }
+            failed = []
+            for name, future in route_futures.items():
+                results[name] = future.result()
+                if not results[name]:
+                    logger.error(f"添加路由 {name} 失败，开始清理服务")
+                    failed.append(name)
+
+            # 路由添加失败时并发清理已创建的服务
+            for future in [executor.submit(self._delete_service, name) for name in failed]:
+                future.result()
+
+            for name, future in fallback_futures.items():
+                results[name] = future.result()
+
+        logger.info(f"批量添加 HTTP 代理完成: {sum(results.values())}/{len(results)} 成功")
+        return results
+
     def update_http_proxy(self, name: str, port: int) -> bool:
         """
         更新 HTTP 代理
@@ -133,12 +251,13 @@ class KongProxy:
 
     def _get_service(self, name: str) -> Optional[Dict[str, Any]]:
         """ 获取服务信息 """
-        url = f"{self.kong_admin_url}/services/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.services_url}/{full_name}"
 
         try:
-            response = self.session.get(url)
+            response = self._request('GET', url)
             if response.status_code == 200:
-                logger.info(f"服务 http-{name} 已存在")
+                logger.info(f"服务 {full_name} 已存在")
                 return response.json()
             else:
                 logger.error(f"获取服务信息失败: {response.status_code} - {response.text}")
@@ -149,18 +268,20 @@ class KongProxy:
 
     def _add_service(self, name: str, protocol: str, host: str, port: int) -> bool:
         """添加服务"""
-        url = f"{self.kong_admin_url}/services"
+        full_name = self._svc_name(name)
+        url = self.services_url
         data = {
-            'name': f"http-{name}",
+            'name': full_name,
             'protocol': protocol,
             'host': host,
-            'port': str(port)
+            'port': port
         }
 
         try:
-            response = self.session.post(url, data=data)
+            response = self._request('POST', url, data=orjson.dumps(data))
+            self._invalidate_service(name)
             if response.status_code == 201:
-                logger.info(f"服务 http-{name} 添加成功")
+                logger.info(f"服务 {full_name} 添加成功")
                 return True
             else:
                 logger.error(f"添加服务失败: {response.status_code} - {response.text}")
@@ -171,15 +292,17 @@ class KongProxy:
 
     def _update_service(self, name: str, port: int) -> bool:
         """更新服务"""
-        url = f"{self.kong_admin_url}/services/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.services_url}/{full_name}"
         data = {
-            'port': str(port)
+            'port': port
         }
 
         try:
-            response = self.session.patch(url, data=data)
+            response = self._request('PATCH', url, data=orjson.dumps(data))
+            self._invalidate_service(name)
             if response.status_code == 200:
-                logger.info(f"服务 http-{name} 更新成功")
+                logger.info(f"服务 {full_name} 更新成功")
                 return True
             else:
                 logger.error(f"更新服务失败: {response.status_code} - {response.text}")
@@ -190,17 +313,19 @@ class KongProxy:
 
     def _add_route(self, name: str, domain: str) -> bool:
         """添加路由"""
-        url = f"{self.kong_admin_url}/services/http-{name}/routes"
+        full_name = self._svc_name(name)
+        url = f"{self.services_url}/{full_name}/routes"
         data = {
-            'name': f"http-{name}",
-            'protocols[]': 'http',
-            'hosts[]': domain
+            'name': full_name,
+            'protocols': ['http'],
+            'hosts': [domain]
         }
 
         try:
-            response = self.session.post(url, data=data)
+            response = self._request('POST', url, data=orjson.dumps(data))
+            self._invalidate_route(name)
             if response.status_code == 201:
-                logger.info(f"路由 http-{name} 添加成功")
+                logger.info(f"路由 {full_name} 添加成功")
                 return True
             else:
                 logger.error(f"添加路由失败: {response.status_code} - {response.text}")
@@ -211,15 +336,17 @@ class KongProxy:
 
     def _delete_route(self, name: str) -> bool:
         """删除路由"""
-        url = f"{self.kong_admin_url}/routes/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.routes_url}/{full_name}"
 
         try:
-            response = self.session.delete(url)
+            response = self._request('DELETE', url)
+            self._invalidate_route(name)
             if response.status_code == 204:
-                logger.info(f"路由 http-{name} 删除成功")
+                logger.info(f"路由 {full_name} 删除成功")
                 return True
             elif response.status_code == 404:
-                logger.warning(f"路由 http-{name} 不存在")
+                logger.warning(f"路由 {full_name} 不存在")
                 return False
             else:
                 logger.error(f"删除路由失败: {response.status_code} - {response.text}")
@@ -230,15 +357,17 @@ class KongProxy:
 
     def _delete_service(self, name: str) -> bool:
         """删除服务"""
-        url = f"{self.kong_admin_url}/services/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.services_url}/{full_name}"
 
         try:
-            response = self.session.delete(url)
+            response = self._request('DELETE', url)
+            self._invalidate_service(name)
             if response.status_code == 204:
-                logger.info(f"服务 http-{name} 删除成功")
+                logger.info(f"服务 {full_name} 删除成功")
                 return True
             elif response.status_code == 404:
-                logger.warning(f"服务 http-{name} 不存在")
+                logger.warning(f"服务 {full_name} 不存在")
                 return False
             else:
                 logger.error(f"删除服务失败: {response.status_code} - {response.text}")
@@ -257,14 +386,22 @@ class KongProxy:
         Returns:
             Dict: 服务信息，如果服务不存在返回 None
         """
-        url = f"{self.kong_admin_url}/services/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.services_url}/{full_name}"
+        with self._cache_lock:
+            cached = self._svc_cache.get(name)
+        if cached is not None:
+            return cached
 
         try:
-            response = self.session.get(url)
+            response = self._request('GET', url)
             if response.status_code == 200:
-                return response.json()
+                info = response.json()
+                with self._cache_lock:
+                    self._svc_cache[name] = info
+                return info
             elif response.status_code == 404:
-                logger.warning(f"服务 http-{name} 不存在")
+                logger.warning(f"服务 {full_name} 不存在")
                 return None
             else:
                 logger.error(f"获取服务信息失败: {response.status_code} - {response.text}")
@@ -283,14 +420,22 @@ class KongProxy:
         Returns:
             Dict: 路由信息，如果路由不存在返回 None
         """
-        url = f"{self.kong_admin_url}/routes/http-{name}"
+        full_name = self._svc_name(name)
+        url = f"{self.routes_url}/{full_name}"
+        with self._cache_lock:
+            cached = self._route_cache.get(name)
+        if cached is not None:
+            return cached
 
         try:
-            response = self.session.get(url)
+            response = self._request('GET', url)
             if response.status_code == 200:
-                return response.json()
+                info = response.json()
+                with self._cache_lock:
+                    self._route_cache[name] = info
+                return info
             elif response.status_code == 404:
-                logger.warning(f"路由 http-{name} 不存在")
+                logger.warning(f"路由 {full_name} 不存在")
                 return None
             else:
                 logger.error(f"获取路由信息失败: {response.status_code} - {response.text}")
@@ -0,0 +1,323 @@
+import orjson
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Generic, Optional, Type, TypeVar
+import etcd3
+from services.watch_cache import EtcdWatchCache
+from services.etcd_client import get_etcd_client, release_etcd_client
+from utils.retry import retry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# etcd 对已过期或已撤销租约的写入返回的错误信息
+_LEASE_NOT_FOUND = "requested lease not found"
+
+# 注册信息租约的默认 TTL（秒）。注册信息是删除服务时清理 Kong / FRP 代理的唯一依据，
+# 因此默认值要覆盖重新部署、拉取镜像等较长的停机时间
+DEFAULT_LEASE_TTL = 86400
+
+# 续约间隔上限（秒），TTL 较长时也能及时发现租约失效
+_MAX_KEEPALIVE_INTERVAL = 60.0
+
+
+@lru_cache(maxsize=1)
+def _ts_for_second(sec: int) -> str:
+    """格式化指定秒的本地时间，同一秒内重复注册直接复用结果"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+
+
+class _EtcdRegistryBase(Generic[T]):
+    """基于 etcd 的服务注册客户端基类，子类指定服务信息类型"""
+
+    model_cls: Type[T]
+    kind: str = ""          # 日志中的服务类型，如 HTTP / SSH
+
+    def __init__(self, etcd_host: str, etcd_port: int, service_prefix: str,
+                 lease_ttl: int = DEFAULT_LEASE_TTL):
+        """
+        初始化 etcd 服务注册客户端
+
+        :param etcd_host: etcd 服务器地址
+        :param etcd_port: etcd 服务器端口
+        :param service_prefix: 服务键前缀
+        :param lease_ttl: 注册信息所绑定租约的 TTL（秒），进程退出后注册信息随租约过期
+        """
+        self.etcd_host = etcd_host
+        self.etcd_port = etcd_port
+        self.service_prefix = service_prefix
+        self._prefix_len = len(service_prefix.encode('utf-8'))
+        # 连接时获取进程内共享的 etcd 客户端
+        self.client: Optional[etcd3.Etcd3Client] = None
+
+        # 基于 watch 的服务缓存，减少 etcd 读取
+        self._cache: EtcdWatchCache[T] = EtcdWatchCache(service_prefix, self._parse_service)
+
+        # 注册信息绑定到租约，由后台线程续约；记录本进程写入的服务，租约过期后重新写入
+        self.lease_ttl = lease_ttl
+        self._lease = None
+        self._lease_lock = threading.Lock()
+        self._leased: Dict[str, T] = {}
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    def connect(self) -> bool:
+        """连接到 etcd 服务器"""
+        try:
+            if self.client is None:
+                self.client = get_etcd_client(self.etcd_host, self.etcd_port)
+            # 测试连接
+            self.client.status()
+            logger.info(f"成功连接到 etcd 服务器: {self.etcd_host}:{self.etcd_port}")
+
+            # 启动服务缓存，失败时退回直接读取 etcd
+            self._cache.start(self.client)
+            self._start_lease()
+            return True
+        except Exception as e:
+            logger.error(f"连接 etcd 服务器失败: {e}")
+            return False
+
+    def disconnect(self):
+        """断开 etcd 连接"""
+        if self.client:
+            self._stop_lease()
+            self._cache.stop()
+            release_etcd_client(self.etcd_host, self.etcd_port)
+            self.client = None
+            logger.info("已断开 etcd 连接")
+
+    def _start_lease(self):
+        """
+        申请租约并启动后台续约线程
+
+        etcd 中已有的注册信息（包括上次运行时写入、旧租约尚未过期的）重新绑定到新租约，
+        重启后注册信息与仍在运行的 Kong / FRP 代理保持一致
+        """
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+
+        try:
+            self._leased.update(self.list_services())
+            self._renew_lease()
+            if self._leased:
+                logger.info(f"已将 {len(self._leased)} 个{self.kind}服务绑定到新租约")
+        except Exception as e:
+            # 申请失败时由续约线程重试，期间的注册信息不绑定租约
+            logger.warning(f"申请 etcd 租约失败: {e}")
+
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive, name=f"etcd-lease-{self.kind.lower()}", daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def _stop_lease(self):
+        """
+        停止续约，不撤销租约
+
+        Kong / FRP 代理在进程退出后仍然生效，撤销租约会删除对应的注册信息，
+        因此只停止续约，重启后由 _start_lease 重新绑定；进程长时间未恢复时注册信息随 TTL 过期
+        """
+        self._keepalive_stop.set()
+        if self._keepalive_thread:
+            self._keepalive_thread.join(timeout=5)
+            self._keepalive_thread = None
+
+        self._lease = None
+        self._leased.clear()
+
+    def _keepalive(self):
+        """按 TTL 的三分之一周期（不超过 60 秒）续约，租约过期时申请新租约并重新写入注册信息"""
+        interval = min(max(1.0, self.lease_ttl / 3), _MAX_KEEPALIVE_INTERVAL)
+        while not self._keepalive_stop.wait(interval):
+            try:
+                lease = self._lease
+                if lease is not None:
+                    responses = lease.refresh()
+                    if responses and responses[0].TTL > 0:
+                        continue
+                    logger.warning(f"{self.kind}服务注册租约已过期，重新注册 {len(self._leased)} 个服务")
+                self._renew_lease(expired=lease)
+            except Exception as e:
+                logger.warning(f"etcd 租约续约失败: {e}")
+
+    def _renew_lease(self, expired=None):
+        """
+        申请新租约，并将本进程注册的服务重新写入 etcd
+
+        :param expired: 已失效的租约，其他线程已完成替换时不再重复申请
+        """
+        with self._lease_lock:
+            if expired is not None and self._lease is not expired:
+                return
+
+            # 全部服务写入成功后才切换租约，中途失败时下次续约会重新申请
+            lease = self.client.lease(self.lease_ttl)
+            for service_name, service_info in list(self._leased.items()):
+                self.client.put(self.service_key(service_name), service_info.to_json(), lease=lease)
+                self._cache.put(service_name, service_info)
+            self._lease = lease
+
+    def _put_service(self, service_key: str, service_info: T):
+        """写入绑定到当前租约的服务信息，租约已失效时申请新租约后再写入"""
+        lease = self._lease
+        try:
+            self.client.put(service_key, service_info.to_json(), lease=lease)
+        except Exception as e:
+            if lease is None or _LEASE_NOT_FOUND not in str(e):
+                raise
+            logger.warning(f"{self.kind}服务注册租约已失效，重新申请租约")
+            self._renew_lease(expired=lease)
+            self.client.put(service_key, service_info.to_json(), lease=self._lease)
+
+    @staticmethod
+    def _create_time() -> str:
+        """获取当前时间作为服务创建时间"""
+        return _ts_for_second(int(time.time()))
+
+    def _parse_service(self, service_name: str, value: bytes) -> Optional[T]:
+        """解析 etcd 中存储的服务信息"""
+        try:
+            return self.model_cls(**orjson.loads(value))
+        except (orjson.JSONDecodeError, TypeError) as e:
+            logger.error(f"解析{self.kind}服务数据失败 {service_name}: {e}")
+            return None
+
+    def register(self, service_name: str, service_info: T) -> bool:
+        """
+        将服务信息写入 etcd
+
+        :param service_name: 服务名称
+        :param service_info: 服务信息
+        :return: 注册是否成功
+        """
+        if not self.client:
+            logger.error("etcd 客户端未连接")
+            return False
+
+        try:
+            service_key = self.service_key(service_name)
+
+            # 写入 etcd（失败时退避重试）
+            retry(lambda: self._put_service(service_key, service_info),
+                  should_retry=lambda _: False, key=f"PUT {self.service_prefix}")
+            self._cache.put(service_name, service_info)
+            self._leased[service_name] = service_info
+
+            logger.info(f"成功注册{self.kind}服务: {service_name}")
+            logger.debug("  etcd 键: %s", service_key)
+            return True
+
+        except Exception as e:
+            logger.error(f"注册{self.kind}服务失败 {service_name}: {e}")
+            return False
+
+    def unregister_service(self, service_name: str) -> bool:
+        """
+        从 etcd 中删除服务
+
+        :param service_name: 服务名称
+        :return: 删除是否成功
+        """
+        if not self.client:
+            logger.error("etcd 客户端未连接")
+            return False
+
+        try:
+            # 从 etcd 删除；持有租约锁，避免正在进行的租约续期把刚删除的服务重新写入
+            with self._lease_lock:
+                deleted = self.client.delete(self.service_key(service_name))
+                self._cache.pop(service_name)
+                self._leased.pop(service_name, None)
+            if deleted:
+                logger.info(f"成功删除{self.kind}服务: {service_name}")
+            else:
+                logger.warning(f"{self.kind}服务不存在: {service_name}")
+
+            return deleted
+
+        except Exception as e:
+            logger.error(f"删除{self.kind}服务失败 {service_name}: {e}")
+            return False
+
+    def service_key(self, service_name: str) -> str:
+        """获取服务在 etcd 中的键"""
+        return f"{self.service_prefix}{service_name}"
+
+    def sync_cache(self) -> bool:
+        """确保服务缓存与 etcd 保持同步，监听中断时重新加载，返回缓存是否可用"""
+        return self._cache.sync()
+
+    def get_cached(self, service_name: str) -> Optional[T]:
+        """仅从缓存获取服务信息，不访问 etcd"""
+        return self._cache.get(service_name)
+
+    def load_service(self, service_name: str, value: bytes) -> Optional[T]:
+        """解析从 etcd 读取到的值并写入缓存"""
+        return self._cache.load(service_name, value)
+
+    def get_service(self, service_name: str) -> Optional[T]:
+        """
+        从 etcd 获取服务信息
+
+        :param service_name: 服务名称
+        :return: 服务信息，如果不存在则返回 None
+        """
+        if not self.client:
+            logger.error("etcd 客户端未连接")
+            return None
+
+        # 监听正常时缓存即为完整的服务数据，直接从内存返回
+        if self.sync_cache():
+            return self._cache.get(service_name)
+
+        try:
+            # 缓存未命中，直接从 etcd 获取
+            value, _ = self.client.get(self.service_key(service_name))
+
+            if value:
+                service = self._parse_service(service_name, value)
+                if service:
+                    self._cache.put(service_name, service)
+                return service
+            else:
+                logger.debug("%s服务不存在: %s", self.kind, service_name)
+                return None
+
+        except Exception as e:
+            logger.error(f"获取{self.kind}服务信息失败 {service_name}: {e}")
+            return None
+
+    def list_services(self) -> Dict[str, T]:
+        """
+        列出所有已注册的服务
+
+        :return: 服务信息字典
+        """
+        if not self.client:
+            logger.error("etcd 客户端未连接")
+            return {}
+
+        # 监听正常时直接返回缓存快照
+        if self.sync_cache():
+            return self._cache.snapshot()
+
+        try:
+            services = {}
+            # 获取所有以服务前缀开头的键值对
+            for value, metadata in self.client.get_prefix(self.service_prefix):
+                if value:
+                    service_name = metadata.key[self._prefix_len:].decode('utf-8')
+                    service = self._parse_service(service_name, value)
+                    if service:
+                        services[service_name] = service
+
+            return services
+
+        except Exception as e:
+            logger.error(f"获取{self.kind}服务列表失败: {e}")
+            return {}
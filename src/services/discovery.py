@@ -1,14 +1,12 @@
-import json
+import orjson
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from dataclasses import dataclass
+from functools import cached_property
 import etcd3
+from services.watch_cache import EtcdWatchCache
+from services.etcd_client import get_etcd_client, release_etcd_client
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -29,8 +27,9 @@ class ContainerService:
         if self.environment is None:
             self.environment = []
 
-    def get_service_ports(self) -> Dict[str, str]:
-        """获取服务端口映射 (内部端口 -> 主机端口)"""
+    @cached_property
+    def service_ports(self) -> Dict[str, str]:
+        """服务端口映射 (内部端口 -> 主机端口)，端口绑定构造后不变，首次访问时计算"""
         port_map = {}
         for internal_port, bindings in self.port_bindings.items():
             if bindings and len(bindings) > 0:
@@ -39,6 +38,18 @@ class ContainerService:
                     port_map[internal_port] = host_port
         return port_map
 
+    def get_service_ports(self) -> Dict[str, str]:
+        """获取服务端口映射 (内部端口 -> 主机端口)"""
+        return self.service_ports
+
+    @cached_property
+    def ports_by_num(self) -> Dict[int, int]:
+        """获取按端口号索引的端口映射 (内部端口号 -> 主机端口号)，同一端口号保留第一个协议的映射"""
+        ports = {}
+        for port_key, host_port in self.service_ports.items():
+            ports.setdefault(int(port_key.split('/', 1)[0]), int(host_port))
+        return ports
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         return {
@@ -51,7 +62,7 @@ class ContainerService:
             'port_bindings': self.port_bindings,
             'hostname': self.hostname,
             'environment': self.environment,
-            'service_ports': self.get_service_ports()
+            'service_ports': self.service_ports
         }
 
 
@@ -70,16 +81,24 @@ class EtcdServiceDiscovery:
         self.etcd_host = etcd_host
         self.etcd_port = etcd_port
         self.service_prefix = service_prefix
-        self.client = None
-        self.services: Dict[str, ContainerService] = {}
+        self._prefix_len = len(service_prefix.encode('utf-8'))
+        # 连接时获取进程内共享的 etcd 客户端
+        self.client: Optional[etcd3.Etcd3Client] = None
+
+        # 基于 watch 的服务缓存，减少 etcd 读取
+        self._cache: EtcdWatchCache[ContainerService] = EtcdWatchCache(service_prefix, self.parse_container_data)
 
     def connect(self) -> bool:
         """连接到 etcd 服务器"""
         try:
-            self.client = etcd3.client(host=self.etcd_host, port=self.etcd_port)
+            if self.client is None:
+                self.client = get_etcd_client(self.etcd_host, self.etcd_port)
             # 测试连接
             self.client.status()
             logger.info(f"成功连接到 etcd 服务器: {self.etcd_host}:{self.etcd_port}")
+
+            # 启动服务缓存并持续监听变更，失败时退回直接读取 etcd
+            self._cache.start(self.client)
             return True
         except Exception as e:
             logger.error(f"连接 etcd 服务器失败: {e}")
@@ -88,72 +107,77 @@ class EtcdServiceDiscovery:
     def disconnect(self):
         """断开 etcd 连接"""
         if self.client:
-            self.client.close()
+            self._cache.stop()
+            release_etcd_client(self.etcd_host, self.etcd_port)
+            self.client = None
             logger.info("已断开 etcd 连接")
 
-    def parse_container_data(self, service_name: str, data: str) -> Optional[ContainerService]:
+    def parse_container_data(self, service_name: str, data: Union[str, bytes]) -> Optional[ContainerService]:
         """解析容器数据"""
         try:
-            container_info = json.loads(data)
-
-            config = container_info.get('config', {})
-            host_config = container_info.get('hostConfig', {})
-
-            service = ContainerService(
-                service_name=service_name,
-                container_name=container_info.get('containerName', ''),
-                image=config.get('Image', ''),
-                create_time=container_info.get('createTime', ''),
-                version=container_info.get('version', 1),
-                exposed_ports=config.get('ExposedPorts', {}),
-                port_bindings=host_config.get('PortBindings', {}),
-                hostname=config.get('Hostname', ''),
-                environment=config.get('Env', [])
-            )
+            get_info = orjson.loads(data).get
+            config = get_info('config') or {}
+            get_config = config.get
+            host_config = get_info('hostConfig') or {}
 
-            return service
-        except (json.JSONDecodeError, KeyError) as e:
+            # 按字段顺序构造: service_name, container_name, image, create_time, version,
+            # exposed_ports, port_bindings, hostname, environment
+            return ContainerService(
+                service_name,
+                get_info('containerName', ''),
+                get_config('Image', ''),
+                get_info('createTime', ''),
+                get_info('version', 1),
+                get_config('ExposedPorts', {}),
+                host_config.get('PortBindings', {}),
+                get_config('Hostname', ''),
+                get_config('Env', [])
+            )
+        except (orjson.JSONDecodeError, AttributeError, KeyError) as e:
             logger.error(f"解析容器数据失败: {e}")
             return None
 
     def print_service_details(self, service: ContainerService, action: str = "发现"):
-        """打印服务详情"""
+        """打印服务详情（仅在 DEBUG 级别输出）"""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
         logger.debug("")
-        logger.debug("" + "="*80)
-        logger.debug(f"🔍 {action}新服务: {service.container_name}")
-        logger.debug("="*80)
+        logger.debug("=" * 80)
+        logger.debug("🔍 %s新服务: %s", action, service.container_name)
+        logger.debug("=" * 80)
 
-        logger.debug(f"📦 容器名称: {service.container_name}")
-        logger.debug(f"🐳 镜像: {service.image}")
-        logger.debug(f"📅 创建时间: {service.create_time}")
-        logger.debug(f"🔢 版本: {service.version}")
-        logger.debug(f"🏠 主机名: {service.hostname or '未设置'}")
+        logger.debug("📦 容器名称: %s", service.container_name)
+        logger.debug("🐳 镜像: %s", service.image)
+        logger.debug("📅 创建时间: %s", service.create_time)
+        logger.debug("🔢 版本: %s", service.version)
+        logger.debug("🏠 主机名: %s", service.hostname or '未设置')
 
         # 打印端口映射
-        port_map = service.get_service_ports()
+        port_map = service.service_ports
         if port_map:
             logger.debug("")
             logger.debug("端口映射:")
             for internal_port, host_port in port_map.items():
                 service_type = internal_port.split('/')[0]
                 protocol = internal_port.split('/')[1] if '/' in internal_port else 'tcp'
-                logger.debug(f"  • {service_type}/{protocol} -> 主机端口 {host_port}")
+                logger.debug("  • %s/%s -> 主机端口 %s", service_type, protocol, host_port)
 
         # 打印暴露的端口
         if service.exposed_ports:
-            logger.debug(f"")
-            logger.debug(f"📡 暴露端口: {', '.join(service.exposed_ports.keys())}")
+            logger.debug("")
+            logger.debug("📡 暴露端口: %s", ', '.join(service.exposed_ports.keys()))
 
         # 打印环境变量
         if service.environment:
-            logger.debug(f"")
-            logger.debug(f"🔧 环境变量 ({len(service.environment)} 个):")
+            logger.debug("")
+            logger.debug("🔧 环境变量 (%d 个):", len(service.environment))
             for env in service.environment[:5]:  # 只显示前5个
-                logger.debug(f"  • {env}")
+                logger.debug("  • %s", env)
             if len(service.environment) > 5:
-                logger.debug(f"  ... 还有 {len(service.environment) - 5} 个环境变量")
+                logger.debug("  ... 还有 %d 个环境变量", len(service.environment) - 5)
 
-        logger.debug("="*80)
+        logger.debug("=" * 80)
 
     def get_all_services(self) -> Dict[str, ContainerService]:
         """获取所有现有服务"""
@@ -161,39 +185,66 @@ class EtcdServiceDiscovery:
             logger.error("etcd 客户端未连接")
             return {}
 
+        # 监听正常时直接返回缓存快照
+        if self.sync_cache():
+            return self._cache.snapshot()
+
         try:
             services = {}
+            prefix_len = self._prefix_len
+            parse = self.parse_container_data
             # 获取所有以服务前缀开头的键值对
             for value, metadata in self.client.get_prefix(self.service_prefix):
                 if value:
-                    key = metadata.key.decode('utf-8')
-                    service_name = key.replace(self.service_prefix, '')
-
-                    service = self.parse_container_data(service_name, value.decode('utf-8'))
+                    service_name = metadata.key[prefix_len:].decode('utf-8')
+                    service = parse(service_name, value)
                     if service:
                         services[service_name] = service
-                        logger.info(f"发现现有服务: {service_name}")
 
+            logger.info("发现现有服务 %d 个", len(services))
             return services
         except Exception as e:
             logger.error(f"获取服务列表失败: {e}")
             return {}
 
+    def service_key(self, service_name: str) -> str:
+        """获取服务在 etcd 中的键"""
+        return f"{self.service_prefix}{service_name}"
+
+    def sync_cache(self) -> bool:
+        """确保服务缓存与 etcd 保持同步，监听中断时重新加载，返回缓存是否可用"""
+        return self._cache.sync()
+
+    def get_cached(self, service_name: str) -> Optional[ContainerService]:
+        """仅从缓存获取服务信息，不访问 etcd"""
+        return self._cache.get(service_name)
+
+    def load_service(self, service_name: str, value: bytes) -> Optional[ContainerService]:
+        """解析从 etcd 读取到的值并写入缓存"""
+        return self._cache.load(service_name, value)
+
     def get_service(self, service_name: str) -> Optional[ContainerService]:
         """获取特定服务信息"""
         if not self.client:
             logger.error("etcd 客户端未连接")
             return None
 
+        # 缓存命中时直接从内存返回；未命中时监听事件可能尚未到达，仍读取 etcd
+        if self.sync_cache():
+            service = self._cache.get(service_name)
+            if service is not None:
+                return service
+
         try:
-            # 直接从etcd获取服务信息
-            key = f"{self.service_prefix}{service_name}"
+            # 缓存未命中，直接从etcd获取服务信息
+            key = self.service_key(service_name)
             value, _ = self.client.get(key)
 
             if value:
-                service = self.parse_container_data(service_name, value.decode('utf-8'))
+                service = self.parse_container_data(service_name, value)
                 if service:
                     logger.info(f"获取到服务信息: {service_name}")
+                    self._cache.put(service_name, service)
                     return service
             else:
                 logger.info(f"服务不存在: {service_name}")
@@ -205,4 +256,4 @@ class EtcdServiceDiscovery:
 
     def list_services(self) -> List[str]:
         """列出所有服务名称"""
-        return list(self.services.keys())
+        return list(self.get_all_services().keys())
@@ -0,0 +1,59 @@
+import logging
+import threading
+from typing import Dict, Tuple
+import etcd3
+
+logger = logging.getLogger(__name__)
+
+# gRPC 连接保活参数，长时间空闲时及时发现断开的连接
+GRPC_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 10000),
+    ('grpc.http2.min_time_between_pings_ms', 10000),
+]
+
+# (host, port) -> 共享客户端及其引用计数
+_clients: Dict[Tuple[str, int], etcd3.Etcd3Client] = {}
+_refcounts: Dict[Tuple[str, int], int] = {}
+_lock = threading.Lock()
+
+
+def get_etcd_client(host: str, port: int) -> etcd3.Etcd3Client:
+    """
+    获取指定地址共享的 etcd 客户端，同一进程内同一地址只建立一条 gRPC 连接
+
+    每次调用都会增加引用计数，使用完毕后需调用 release_etcd_client
+    :param host: etcd 服务器地址
+    :param port: etcd 服务器端口
+    :return: etcd 客户端
+    """
+    key = (host, port)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = etcd3.client(host=host, port=port, grpc_options=GRPC_OPTIONS)
+            _clients[key] = client
+            logger.debug("创建共享 etcd 客户端: %s:%s", host, port)
+        _refcounts[key] = _refcounts.get(key, 0) + 1
+        return client
+
+
+def release_etcd_client(host: str, port: int):
+    """
+    释放一次共享 etcd 客户端的引用，引用全部释放后关闭连接
+    :param host: etcd 服务器地址
+    :param port: etcd 服务器端口
+    """
+    key = (host, port)
+    with _lock:
+        count = _refcounts.get(key, 0) - 1
+        if count > 0:
+            _refcounts[key] = count
+            return
+
+        _refcounts.pop(key, None)
+        client = _clients.pop(key, None)
+
+    if client is not None:
+        client.close()
+        logger.debug("已关闭共享 etcd 客户端: %s:%s", host, port)
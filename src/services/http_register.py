@@ -1,19 +1,13 @@
-import json
+import orjson
 import logging
-from typing import Dict, Optional, Any
-from dataclasses import dataclass, asdict
-import etcd3
-from datetime import datetime
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from typing import Dict, Any
+from dataclasses import dataclass
+from services._registry_base import DEFAULT_LEASE_TTL, _EtcdRegistryBase
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class HttpServiceInfo:
     """HTTP服务信息"""
     service_name: str
@@ -25,19 +19,33 @@ class HttpServiceInfo:
 
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式用于存储到 etcd"""
-        return asdict(self)
-
-    def to_json(self) -> str:
-        """转换为 JSON 字符串"""
-        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
-
-
-class EtcdHttpServiceRegister:
+        return {
+            'service_name': self.service_name,
+            'container_name': self.container_name,
+            'http_port': self.http_port,
+            'http_endpoint': self.http_endpoint,
+            'create_time': self.create_time,
+            'version': self.version
+        }
+
+    def to_json(self) -> bytes:
+        """转换为 JSON（UTF-8 字节串，可直接写入 etcd），默认版本号不写入以减小存储"""
+        data = self.to_dict()
+        if self.version == 1:
+            del data['version']
+        return orjson.dumps(data)
+
+
+class EtcdHttpServiceRegister(_EtcdRegistryBase[HttpServiceInfo]):
     """基于 etcd 的HTTP服务注册客户端"""
 
+    model_cls = HttpServiceInfo
+    kind = "HTTP"
+
     def __init__(self, etcd_host: str = 'localhost', etcd_port: int = 2379,
                  service_prefix: str = '/gateway-client/services/http/',
-                 http_endpoint: str = 'example.com'):
+                 http_endpoint: str = 'example.com',
+                 lease_ttl: int = DEFAULT_LEASE_TTL):
         """
         初始化 etcd 服务注册客户端
 
@@ -45,30 +53,10 @@ class EtcdHttpServiceRegister:
         :param etcd_port: etcd 服务器端口
         :param service_prefix: 服务键前缀
         :param http_endpoint: HTTP 访问端点
+        :param lease_ttl: 注册信息所绑定租约的 TTL（秒）
         """
-        self.etcd_host = etcd_host
-        self.etcd_port = etcd_port
-        self.service_prefix = service_prefix
+        super().__init__(etcd_host, etcd_port, service_prefix, lease_ttl)
         self.http_endpoint = http_endpoint
-        self.client = None
-
-    def connect(self) -> bool:
-        """连接到 etcd 服务器"""
-        try:
-            self.client = etcd3.client(host=self.etcd_host, port=self.etcd_port)
-            # 测试连接
-            self.client.status()
-            logger.info(f"成功连接到 etcd 服务器: {self.etcd_host}:{self.etcd_port}")
-            return True
-        except Exception as e:
-            logger.error(f"连接 etcd 服务器失败: {e}")
-            return False
-
-    def disconnect(self):
-        """断开 etcd 连接"""
-        if self.client:
-            self.client.close()
-            logger.info("已断开 etcd 连接")
 
     def register_service(self,
                          http_endpoint: str,
@@ -83,138 +71,34 @@ class EtcdHttpServiceRegister:
         :param http_port: HTTP 端口
         :return: 注册是否成功
         """
-        if not self.client:
-            logger.error("etcd 客户端未连接")
-            return False
-
-        try:
-            # 生成服务信息
-            service_info = HttpServiceInfo(
-                service_name=service_name,
-                container_name=container_name,
-                http_port=http_port,
-                http_endpoint=http_endpoint,
-                create_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-
-            # 构建 etcd 键
-            service_key = f"{self.service_prefix}{service_name}"
-
-            # 写入 etcd
-            self.client.put(service_key, service_info.to_json())
-
-            logger.info(f"成功注册HTTP服务: {service_name}")
-            logger.debug(f"  HTTP 端点: {service_info.http_endpoint}")
-            logger.debug(f"  etcd 键: {service_key}")
-
-            return True
-
-        except Exception as e:
-            logger.error(f"注册服务失败 {service_name}: {e}")
-            return False
-
-    def unregister_service(self, service_name: str) -> bool:
-        """
-        从 etcd 中删除HTTP服务
-
-        :param service_name: 服务名称
-        :return: 删除是否成功
-        """
-        if not self.client:
-            logger.error("etcd 客户端未连接")
-            return False
-
-        try:
-            # 构建 etcd 键
-            service_key = f"{self.service_prefix}{service_name}"
-
-            # 从 etcd 删除
-            deleted = self.client.delete(service_key)
-            if deleted:
-                logger.info(f"成功删除服务: {service_name}")
-            else:
-                logger.warning(f"服务不存在: {service_name}")
-
-            return deleted
-
-        except Exception as e:
-            logger.error(f"删除服务失败 {service_name}: {e}")
-            return False
-
-    def get_service(self, service_name: str) -> Optional[HttpServiceInfo]:
-        """
-        从 etcd 获取HTTP服务信息
-
-        :param service_name: 服务名称
-        :return: 服务信息，如果不存在则返回 None
-        """
-        if not self.client:
-            logger.error("etcd 客户端未连接")
-            return None
-
-        try:
-            service_key = f"{self.service_prefix}{service_name}"
-            value, _ = self.client.get(service_key)
-
-            if value:
-                service_data = json.loads(value.decode('utf-8'))
-                return HttpServiceInfo(**service_data)
-            else:
-                logger.debug(f"HTTP服务不存在: {service_name}")
-                return None
-
-        except Exception as e:
-            logger.error(f"获取服务信息失败 {service_name}: {e}")
-            return None
-
-    def list_services(self) -> Dict[str, HttpServiceInfo]:
-        """
-        列出所有已注册的HTTP服务
-
-        :return: 服务信息字典
-        """
-        if not self.client:
-            logger.error("etcd 客户端未连接")
-            return {}
-
-        try:
-            services = {}
-            # 获取所有以服务前缀开头的键值对
-            for value, metadata in self.client.get_prefix(self.service_prefix):
-                if value:
-                    key = metadata.key.decode('utf-8')
-                    container_name = key.replace(self.service_prefix, '')
-
-                    try:
-                        service_data = json.loads(value.decode('utf-8'))
-                        services[container_name] = HttpServiceInfo(**service_data)
-                    except (json.JSONDecodeError, TypeError) as e:
-                        logger.error(f"解析HTTP服务数据失败 {container_name}: {e}")
-                        continue
-
-            return services
-
-        except Exception as e:
-            logger.error(f"获取服务列表失败: {e}")
-            return {}
+        # 生成服务信息
+        service_info = HttpServiceInfo(
+            service_name=service_name,
+            container_name=container_name,
+            http_port=http_port,
+            http_endpoint=http_endpoint,
+            create_time=self._create_time()
+        )
+        logger.debug("  HTTP 端点: %s", service_info.http_endpoint)
+        return self.register(service_name, service_info)
 
     def print_service_summary(self):
-        """打印HTTP服务注册摘要"""
-        services = self.list_services()
+        """输出HTTP服务注册摘要（读取 watch 缓存，不访问 etcd，可能略滞后于最新变更）"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
 
-        print("\n" + "="*80)
-        print("🌐 网关客户端HTTP服务注册摘要")
-        print("="*80)
+        services = self._cache.snapshot()
 
-        if services:
-            print(f"📊 已注册HTTP服务数量: {len(services)}")
-            print("\nHTTP服务列表:")
+        logger.info("=" * 80)
+        logger.info("🌐 网关客户端HTTP服务注册摘要")
+        logger.info("=" * 80)
 
+        if services:
+            logger.info("📊 已注册HTTP服务数量: %d", len(services))
             for service_name, service in services.items():
-                print(f"\n📦 {service_name}")
-                print(f"  🌐 HTTP: {service.http_endpoint}")
-                print(f"  📅 创建时间: {service.create_time}")
+                logger.info("📦 %s  🌐 HTTP: %s  📅 创建时间: %s",
+                            service_name, service.http_endpoint, service.create_time)
         else:
-            print("📭 暂无已注册的HTTP服务")
+            logger.info("📭 暂无已注册的HTTP服务")
 
-        print("="*80)
+        logger.info("=" * 80)
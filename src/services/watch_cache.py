@@ -0,0 +1,140 @@
+import logging
+import threading
+from typing import Callable, Dict, Generic, Optional, TypeVar
+from etcd3.events import DeleteEvent
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class EtcdWatchCache(Generic[T]):
+    """基于 etcd watch 的前缀缓存，在内存中维护 服务名 -> 服务信息 的映射"""
+
+    def __init__(self, service_prefix: str, parse: Callable[[str, bytes], Optional[T]]):
+        """
+        初始化 watch 缓存
+
+        :param service_prefix: 服务键前缀
+        :param parse: 将 (服务名, etcd 值) 解析为服务信息的函数，解析失败返回 None
+        """
+        self.service_prefix = service_prefix
+        self.parse = parse
+        # 键均以前缀开头，按字节长度切片即可得到服务名
+        self._prefix_len = len(service_prefix.encode('utf-8'))
+        self.client = None
+        self.services: Dict[str, T] = {}
+
+        # 缓存已同步到的 etcd revision，watch 正常时缓存即为前缀下的完整数据
+        self.revision = 0
+        self.synced = False
+
+        self._watch_id = None
+        self._lock = threading.Lock()
+
+    def start(self, client) -> bool:
+        """
+        加载前缀下的现有数据，并从加载时的 revision 之后开始监听变更
+
+        加载与监听之间不会遗漏事件，监听正常期间缓存可直接作为查询结果
+        """
+        with self._lock:
+            self._cancel_watch()
+            self.client = client
+
+            try:
+                response = client.get_prefix_response(self.service_prefix)
+
+                services = {}
+                for kv in response.kvs:
+                    if not kv.value:
+                        continue
+                    service_name = self._service_name(kv.key)
+                    service = self.parse(service_name, kv.value)
+                    if service is not None:
+                        services[service_name] = service
+
+                self.services = services
+                self.revision = response.header.revision
+                self._watch_id = client.add_watch_prefix_callback(
+                    self.service_prefix, self._on_event, start_revision=self.revision + 1
+                )
+                self.synced = True
+                logger.info(
+                    f"开始监听 etcd 前缀: {self.service_prefix} "
+                    f"(revision {self.revision}, 已缓存 {len(self.services)} 个服务)"
+                )
+                return True
+            except Exception as e:
+                self.synced = False
+                logger.error(f"监听 etcd 前缀失败 {self.service_prefix}: {e}")
+                return False
+
+    def sync(self) -> bool:
+        """监听中断时重新加载并恢复监听"""
+        if self.synced:
+            return True
+        if self.client is None:
+            return False
+        return self.start(self.client)
+
+    def stop(self):
+        """停止监听并清空缓存"""
+        with self._lock:
+            self._cancel_watch()
+            self.services = {}
+            self.revision = 0
+
+    def get(self, service_name: str) -> Optional[T]:
+        """从缓存获取服务信息"""
+        return self.services.get(service_name)
+
+    def snapshot(self) -> Dict[str, T]:
+        """获取缓存中全部服务的浅拷贝"""
+        return dict(self.services)
+
+    def put(self, service_name: str, service: T):
+        """写入缓存（本地写入 etcd 后立即同步，无需等待 watch 事件）"""
+        self.services[service_name] = service
+
+    def pop(self, service_name: str):
+        """从缓存移除服务"""
+        self.services.pop(service_name, None)
+
+    def load(self, service_name: str, value: bytes) -> Optional[T]:
+        """解析 etcd 值并写入缓存，解析失败返回 None"""
+        service = self.parse(service_name, value)
+        if service is not None:
+            self.services[service_name] = service
+        return service
+
+    def _cancel_watch(self):
+        """取消当前监听，调用方需持有锁"""
+        self.synced = False
+        if self.client and self._watch_id is not None:
+            try:
+                self.client.cancel_watch(self._watch_id)
+            except Exception as e:
+                logger.warning(f"取消 etcd 监听失败 {self.service_prefix}: {e}")
+        self._watch_id = None
+
+    def _service_name(self, key: bytes) -> str:
+        """从 etcd 键中提取服务名"""
+        return key[self._prefix_len:].decode('utf-8')
+
+    def _on_event(self, response):
+        """处理 watch 事件"""
+        if isinstance(response, Exception):
+            # 监听流已中断，标记为未同步，查询时退回 etcd 并重新同步
+            self.synced = False
+            self._watch_id = None
+            logger.error(f"etcd 监听异常 {self.service_prefix}: {response}")
+            return
+
+        for event in response.events:
+            service_name = self._service_name(event.key)
+            if isinstance(event, DeleteEvent):
+                self.services.pop(service_name, None)
+            elif event.value:
+                self.load(service_name, event.value)
+            self.revision = max(self.revision, event.mod_revision)
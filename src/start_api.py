@@ -5,27 +5,30 @@ Gateway Client API 启动脚本
 
 import uvicorn
 import logging
+import os
+from logging_setup import configure_logging
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
 def main():
     """启动 FastAPI 应用"""
+    configure_logging()
     logger.info("🚀 启动 Gateway Client API 服务...")
 
-    # 使用 uvicorn 启动 FastAPI 应用
+    # 使用 uvicorn 启动 FastAPI 应用（uvloop 事件循环 + httptools 解析器）
+    # 端口池与 FRP 代理表为进程内状态，默认单 worker，参见 gunicorn_conf.py
     uvicorn.run(
         "core.routers:app",
         host="0.0.0.0",
         port=2381,
         reload=False,  # 开发模式下自动重载
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv('WORKERS', '1')),
+        backlog=2048,
         log_level="info",
-        access_log=True
+        access_log=os.getenv('ACCESS_LOG', '0') == '1'
     )
 
 
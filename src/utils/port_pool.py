@@ -1,4 +1,6 @@
+import threading
 from collections import deque
+from typing import Dict, Iterable, List
 
 
 class PortPool:
@@ -9,8 +11,10 @@ class PortPool:
         :param exposed_end: 暴露端口结束（包含）
         """
         self.free_ports = deque(range(exposed_start, exposed_end + 1))
+        self._free_set = set(self.free_ports)   # 空闲端口集合，用于 O(1) 判重
         self.mapping = {}           # real_port -> exposed_port
         self.reverse_mapping = {}   # exposed_port -> real_port
+        self._lock = threading.Lock()
 
     def assign(self, service_name: str) -> int:
         """
@@ -18,28 +22,64 @@ class PortPool:
         :param service_name: 服务名
         :return: 暴露端口，如果池满则抛出异常
         """
-        if service_name in self.mapping:
-            return self.mapping[service_name]  # 已经分配过
+        with self._lock:
+            if service_name in self.mapping:
+                return self.mapping[service_name]  # 已经分配过
 
-        if not self.free_ports:
-            raise RuntimeError("No free exposed ports available")
+            if not self.free_ports:
+                raise RuntimeError("No free exposed ports available")
 
-        exposed_port = self.free_ports.popleft()
-        self.mapping[service_name] = exposed_port
-        self.reverse_mapping[exposed_port] = service_name
-        return exposed_port
+            exposed_port = self.free_ports.popleft()
+            self._free_set.discard(exposed_port)
+            self.mapping[service_name] = exposed_port
+            self.reverse_mapping[exposed_port] = service_name
+            return exposed_port
+
+    def assign_many(self, service_names: List[str]) -> Dict[str, int]:
+        """
+        批量分配暴露端口，空闲端口不足时不分配任何端口并抛出异常
+        :param service_names: 服务名列表
+        :return: 服务名 -> 暴露端口
+        """
+        with self._lock:
+            pending = [name for name in dict.fromkeys(service_names) if name not in self.mapping]
+            if len(pending) > len(self.free_ports):
+                raise RuntimeError("No free exposed ports available")
+
+            ports = [self.free_ports.popleft() for _ in pending]
+            self._free_set.difference_update(ports)
+            self.mapping.update(zip(pending, ports))
+            self.reverse_mapping.update(zip(ports, pending))
+            return {name: self.mapping[name] for name in service_names}
 
     def release(self, service_name: str):
         """
         释放真实端口对应的暴露端口
         :param service_name: 服务名
         """
+        with self._lock:
+            self._release(service_name)
+
+    def release_many(self, service_names: Iterable[str]):
+        """
+        批量释放暴露端口
+        :param service_names: 服务名列表
+        """
+        with self._lock:
+            for service_name in service_names:
+                self._release(service_name)
+
+    def _release(self, service_name: str):
+        """释放单个服务的暴露端口，调用方需持有锁"""
         if service_name not in self.mapping:
             return
 
         exposed_port = self.mapping.pop(service_name)
         self.reverse_mapping.pop(exposed_port, None)
-        self.free_ports.append(exposed_port)
+        # 避免重复释放导致同一端口被分配两次
+        if exposed_port not in self._free_set:
+            self._free_set.add(exposed_port)
+            self.free_ports.append(exposed_port)
 
     def lookup_exposed(self, service_name: str) -> int | None:
         """
@@ -0,0 +1,69 @@
+import logging
+import random
+import threading
+import time
+from cachetools import TTLCache
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 每个 key 最近一次输出日志的时间，容量与存活时间有上限，长期运行时不会随 key 增长
+_last_logged: TTLCache = TTLCache(maxsize=1024, ttl=60)
+_last_logged_lock = threading.Lock()
+
+
+def rate_limited_log(level: int, key: str, message: str, interval: float = 1.0):
+    """
+    限频日志，同一个 key 在 interval 秒内最多输出一次
+    :param level: 日志级别
+    :param key: 限频键，通常为操作类型，不要包含服务名等资源标识
+    :param message: 日志内容
+    :param interval: 最小输出间隔（秒）
+    """
+    now = time.monotonic()
+    with _last_logged_lock:
+        if now - _last_logged.get(key, 0.0) < interval:
+            return
+        _last_logged[key] = now
+    logger.log(level, message)
+
+
+def retry(fn: Callable[[], T],
+          retries: int = 3,
+          base: float = 0.2,
+          cap: float = 2.0,
+          should_retry: Optional[Callable[[T], bool]] = None,
+          key: str = "") -> T:
+    """
+    带指数退避和随机抖动的有限次重试
+    :param fn: 待执行的无参函数
+    :param retries: 最大重试次数（不含首次执行）
+    :param base: 退避基数（秒）
+    :param cap: 单次退避上限（秒）
+    :param should_retry: 根据返回值判断是否需要重试，默认返回值为假时重试
+    :param key: 日志限频键
+    :return: 最后一次执行的返回值，最后一次仍抛出异常时原样抛出
+    """
+    if should_retry is None:
+        should_retry = lambda result: not result
+
+    for attempt in range(retries + 1):
+        try:
+            result = fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            reason = str(e)
+        else:
+            if attempt == retries or not should_retry(result):
+                return result
+            reason = "返回失败"
+
+        delay = min(cap, base * 2 ** attempt) * (0.5 + random.random())
+        rate_limited_log(
+            logging.WARNING, key,
+            f"{key or fn} 第 {attempt + 1} 次执行失败 ({reason})，{delay:.2f}s 后重试"
+        )
+        time.sleep(delay)
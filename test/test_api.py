@@ -3,105 +3,264 @@ Gateway Client API 测试脚本
 演示如何使用新的 FastAPI 接口
 """
 
+import argparse
 import requests
 import json
-import logging
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPResponse
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+try:
+    import orjson
+except ImportError:     # 未安装 orjson 时退回标准库
+    orjson = None
+
+# 未安装 orjson 时复用同一个编码器实例
+ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
 
 # API 基础地址
 BASE_URL = "http://localhost:2381"
 
+# 完整请求地址在导入时构建一次
+ROOT_URL = f"{BASE_URL}/"
+HEALTH_URL = f"{BASE_URL}/health"
+BATCH_URL = f"{BASE_URL}/api/v1/gateway/batch"
 
-def test_api_endpoints():
-    """测试 API 端点"""
+# 测试服务名称
+TEST_SERVICE = "newfoo"
 
-    # 测试服务名称
-    test_service = "newfoo"
+# 每种服务各注册两次以验证幂等性，HTTP 与 SSH 交错排列，第二次注册在第一次完成后执行
+REGISTER_OPS = {"ops": [
+    {"op": "register", "proto": proto, "name": TEST_SERVICE}
+    for proto in ("http", "ssh", "http", "ssh")
+]}
+UNREGISTER_OPS = {"ops": [
+    {"op": "unregister", "proto": proto, "name": TEST_SERVICE}
+    for proto in ("http", "ssh")
+]}
 
-    print("🧪 测试 Gateway Client API")
-    print("=" * 50)
+# 测试步骤表：每层为 (标题, 请求列表) 列表，请求为 (method, url[, body])
+# 同一层内的步骤并发执行，层与层之间等待确认
+LAYERS = [
+    [
+        ("1️⃣ 测试根路径...", [("GET", ROOT_URL)]),
+        ("2️⃣ 测试健康检查...", [("GET", HEALTH_URL)]),
+        (f"3️⃣ 测试批量注册 HTTP / SSH 服务 ({TEST_SERVICE})...", [("POST", BATCH_URL, REGISTER_OPS)]),
+    ],
+    [
+        (f"4️⃣ 测试批量删除 HTTP / SSH 服务 ({TEST_SERVICE})...", [("POST", BATCH_URL, UNREGISTER_OPS)]),
+    ],
+]
 
-    # 1. 测试根路径
-    print("\n1️⃣ 测试根路径...")
-    try:
-        response = requests.get(f"{BASE_URL}/")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
+# 是否输出响应内容（--verbose），默认只输出状态码和响应体长度
+VERBOSE = False
 
-    # 2. 测试健康检查
-    print("\n2️⃣ 测试健康检查...")
-    try:
-        response = requests.get(f"{BASE_URL}/health")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
+# 是否在同一连接上流水线发送每层的全部请求（--pipeline），部分中间件不支持流水线请求
+PIPELINE = False
 
-    # 3. 测试注册 HTTP 服务
-    print(f"\n3️⃣ 测试注册 HTTP 服务 ({test_service})...")
-    try:
-        response = requests.get(f"{BASE_URL}/api/v1/gateway/http/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
+# 是否在步骤之间等待确认（--yes 时直接执行，便于自动化运行）
+INTERACTIVE = True
 
-    try:
-        response = requests.get(f"{BASE_URL}/api/v1/gateway/http/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
+# 复用同一个会话，后续请求走 keep-alive 连接，无需重新建立 TCP 连接
+# 连接失败和 502/503/504 由连接池退避重试（批量注册 / 删除接口是幂等的，POST 同样可重试）
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.1,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "DELETE", "POST"]),
+        raise_on_status=False
+    )
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+SESSION.headers.update({"Accept": "application/json", "Connection": "keep-alive"})
 
-    # 4. 测试注册 SSH 服务
-    print(f"\n4️⃣ 测试注册 SSH 服务 ({test_service})...")
-    try:
-        response = requests.get(f"{BASE_URL}/api/v1/gateway/ssh/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
 
+def pause(prompt: str):
+    """交互模式下等待按下 Enter 键"""
+    sys.stdout.flush()
+    if INTERACTIVE:
+        input(prompt)
+
+
+def request(method: str, url: str, body=None):
+    """发送请求，失败时返回异常而不是抛出"""
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/gateway/ssh/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+        return SESSION.request(method, url, json=body)
     except Exception as e:
-        print(f"❌ 请求失败: {e}")
+        return e
+
+
+class _KeepOpen:
+    """共享读缓冲的代理，HTTPResponse 读完响应后关闭文件时不关闭底层缓冲"""
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+    def close(self):
+        pass
+
+
+class _PipelinedSocket:
+    """供 HTTPResponse 使用的套接字包装，所有响应共用同一个读缓冲，避免前一个响应读走后续响应的数据"""
+
+    def __init__(self, sock: socket.socket):
+        self._fp = sock.makefile("rb")
 
-    input("按 Enter 键测试删除服务...")
+    def makefile(self, *args, **kwargs):
+        return _KeepOpen(self._fp)
 
-    # 5. 测试删除 HTTP 服务
-    print(f"\n5️⃣ 测试删除 HTTP 服务 ({test_service})...")
+
+def raw_request(method: str, url: str, body=None) -> bytes:
+    """构造 HTTP/1.1 请求报文"""
+    parts = urlsplit(url)
+    payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"{method} {parts.path or '/'} HTTP/1.1\r\n"
+        f"Host: {parts.netloc}\r\n"
+        "Accept: application/json\r\n"
+        "Connection: keep-alive\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+    )
+    if body is not None:
+        head += "Content-Type: application/json\r\n"
+    return (head + "\r\n").encode("ascii") + payload
+
+
+def pipeline_requests(groups):
+    """
+    在一个连接上依次写出全部请求后再按顺序读取响应，服务端按请求顺序处理，同一步内的先后关系不变
+
+    :param groups: 每个步骤的请求列表
+    :return: 与 groups 对应的结果列表，请求失败的位置为异常
+    """
+    calls = [call for group in groups for call in group]
+    results = []
     try:
-        response = requests.delete(f"{BASE_URL}/api/v1/gateway/http/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+        parts = urlsplit(BASE_URL)
+        with socket.create_connection((parts.hostname, parts.port or 80), timeout=30) as sock:
+            sock.sendall(b"".join(raw_request(*call) for call in calls))
+            shared = _PipelinedSocket(sock)
+            for call in calls:
+                response = HTTPResponse(shared, method=call[0])
+                response.begin()
+                results.append(SimpleNamespace(status_code=response.status, content=response.read()))
     except Exception as e:
-        print(f"❌ 请求失败: {e}")
+        results += [e] * (len(calls) - len(results))
+
+    grouped, start = [], 0
+    for group in groups:
+        grouped.append(results[start:start + len(group)])
+        start += len(group)
+    return grouped
+
+
+def loads(content: bytes):
+    """解析 JSON 响应体"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def pretty(obj) -> str:
+    """格式化已解析的 JSON 对象"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return ENCODER.encode(obj)
+
+
+def show(result, lines: list):
+    """
+    格式化请求结果并追加到输出缓冲，默认只输出状态码和响应体长度，--verbose 时输出响应内容
+
+    :param result: 响应或请求异常
+    :param lines: 输出行缓冲
+    :return: (状态码, 解析后的响应体)，请求失败时为 None；响应体只解析一次，未解析时为 None
+    """
+    if isinstance(result, Exception):
+        lines.append(f"❌ 请求失败: {result}")
+        return None
+
+    status_code = result.status_code
+    body = result.content
+    if not VERBOSE:
+        lines.append(f"状态码: {status_code}  响应: {len(body)} 字节")
+        return status_code, None
 
-    # 6. 测试删除 SSH 服务
-    print(f"\n6️⃣ 测试删除 SSH 服务 ({test_service})...")
+    lines.append(f"状态码: {status_code}")
     try:
-        response = requests.delete(f"{BASE_URL}/api/v1/gateway/ssh/{test_service}")
-        print(f"状态码: {response.status_code}")
-        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-    except Exception as e:
-        print(f"❌ 请求失败: {e}")
+        parsed = loads(body)
+    except ValueError:
+        lines.append(f"响应: {body.decode('utf-8', errors='replace')}")
+        return status_code, None
+    lines.append(f"响应: {pretty(parsed)}")
+    return status_code, parsed
+
+
+def run_layer(executor: ThreadPoolExecutor, steps):
+    """
+    并发（或 --pipeline 时在同一连接上流水线）执行一组互不依赖的请求，并按提交顺序输出结果，每个步骤一次写入
+
+    :param executor: 线程池
+    :param steps: 测试步骤表中的一层，同一步内的请求依次执行
+    """
+    if PIPELINE:
+        grouped = pipeline_requests([calls for _, calls in steps])
+    else:
+        futures = [
+            executor.submit(lambda calls: [request(*call) for call in calls], calls)
+            for _, calls in steps
+        ]
+        grouped = (future.result() for future in futures)
+
+    for (title, _), results in zip(steps, grouped):
+        lines = ["", title]
+        for result in results:
+            show(result, lines)
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
+    sys.stdout.flush()
+
 
-    print("\n" + "=" * 50)
-    print("✅ API 测试完成")
+def test_api_endpoints():
+    """测试 API 端点"""
+    sys.stdout.write("🧪 测试 Gateway Client API\n" + "=" * 50 + "\n")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for i, steps in enumerate(LAYERS):
+            if i:
+                pause("按 Enter 键测试删除服务...")
+            run_layer(executor, steps)
+
+    sys.stdout.write("\n" + "=" * 50 + "\n✅ API 测试完成\n")
+    sys.stdout.flush()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gateway Client API 测试脚本")
+    parser.add_argument("--verbose", action="store_true", help="输出格式化的响应内容，默认只输出状态码和响应体长度")
+    parser.add_argument("-y", "--yes", action="store_true", help="不等待确认，直接执行全部步骤")
+    parser.add_argument("--pipeline", action="store_true", help="每层请求在同一连接上流水线发送（HTTP/1.1 pipelining）")
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+    PIPELINE = args.pipeline
+    INTERACTIVE = not args.yes
+
     print("📝 请确保 API 服务已启动 (python start_api.py)")
-    input("按 Enter 键开始测试...")
-    test_api_endpoints()
+    pause("按 Enter 键开始测试...")
+    try:
+        test_api_endpoints()
+    finally:
+        SESSION.close()